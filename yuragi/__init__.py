@@ -1,7 +1,30 @@
+import importlib
 import os
 import sys
 # 別ディレクトリからでもこの階層にあるモジュールを呼び出すようにするため
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+if _PACKAGE_DIR not in sys.path:
+    sys.path.append(_PACKAGE_DIR)
 
-from .yuragi import Yuragi
-from .shortened_word import SingleShortenedWord, CombinedShortenedWord
+# 公開するクラス -> 定義しているモジュール
+# import yuragi だけではモジュールを読み込まず、初めて参照されたときに読み込む
+_EXPORTS = {
+    'Yuragi': '.yuragi',
+    'SingleShortenedWord': '.shortened_word',
+    'CombinedShortenedWord': '.shortened_word',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,93 @@
+'''ゆらぎ候補語をJSONLで出力するコマンド
+
+タイトルを1行ずつ読み込み、1タイトルにつき1行のJSONを標準出力に書き出す。
+例：
+    $ echo '転生したらスライムだった件' | python -m yuragi
+    {"title": "転生したらスライムだった件", "words": {"divided": [], ...}}
+'''
+import argparse
+import json
+import sys
+
+from candidate_cache import CandidateCache
+from parallel import ParallelGenerator
+from yuragi import Yuragi
+
+
+def read_titles(lines):
+    '''行末の改行を取り除き、空行を飛ばしてタイトルを返す
+    '''
+    for line in lines:
+        title = line.rstrip('\r\n')
+        if title.strip():
+            yield title
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m yuragi',
+        description='タイトルからゆらぎ候補語を作成し、JSONLで出力する')
+    parser.add_argument(
+        'input', nargs='?', default='-',
+        help='タイトルを1行ずつ書いたファイル。省略時や - の場合は標準入力から読む')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=1,
+        help='ワーカープロセス数。1の場合はこのプロセスで処理する（デフォルト: 1）')
+    parser.add_argument(
+        '-c', '--chunk-size', type=int, default=64,
+        help='まとめて処理するタイトル数（デフォルト: 64）')
+    parser.add_argument(
+        '--unordered', action='store_true',
+        help='入力順を保たず、処理が終わった順に出力する（--workers が2以上の場合のみ）')
+    parser.add_argument(
+        '--cache', metavar='PATH',
+        help='ゆらぎ候補語のキャッシュ（SQLite）のファイル。--workers が1の場合のみ使える')
+    parser.add_argument(
+        '--timings', action='store_true',
+        help='タイトルごとの generate() にかかった秒数を elapsed として出力する'
+             '（チャンクでまとめて行う解析は含まない）')
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error('--chunk-size は1以上を指定してください')
+    if args.cache and args.workers > 1:
+        parser.error('--cache は --workers が1の場合のみ使えます')
+    return args
+
+
+def generate(titles, args):
+    if args.workers > 1:
+        generator = ParallelGenerator(
+            max_workers=args.workers, chunk_size=args.chunk_size,
+            ordered=not args.unordered, timings=args.timings)
+        with generator:
+            yield from generator.generate(titles)
+    elif args.cache:
+        with CandidateCache(args.cache) as candidate_cache:
+            yield from Yuragi.generate_many(
+                titles, chunk_size=args.chunk_size,
+                candidate_cache=candidate_cache, timings=args.timings)
+    else:
+        yield from Yuragi.generate_many(
+            titles, chunk_size=args.chunk_size, timings=args.timings)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.input == '-':
+        input_file = sys.stdin
+    else:
+        input_file = open(args.input, encoding='utf-8')
+    try:
+        for result in generate(read_titles(input_file), args):
+            record = {'title': result[0], 'words': result[1]}
+            if args.timings:
+                record['elapsed'] = result[2]
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+            sys.stdout.flush()
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+
+
+if __name__ == '__main__':
+    main()
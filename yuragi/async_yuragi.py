@@ -0,0 +1,108 @@
+'''asyncioからゆらぎ候補語を作成するためのフロントエンド
+
+Yuragi(...).generate() をそのまま呼ぶと、MeCabの解析と結合語の作成の間
+イベントループが止まってしまう。AsyncYuragi は処理をエグゼキュータに渡し、
+結果を待つ間もイベントループを止めない。
+例：
+    async with AsyncYuragi(max_workers=4) as generator:
+        words = await generator.generate('転生したらスライムだった件', timeout=1.0)
+'''
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import tagger
+from yuragi import Yuragi
+
+
+def _generate(title, kwargs):
+    return Yuragi(title, **kwargs).generate()
+
+
+class AsyncYuragi:
+    '''エグゼキュータでゆらぎ候補語を作成する、asyncio向けのインターフェース
+
+    - ワーカーは起動時に辞書を読み込むので、リクエストの処理中に読み込みは発生しない
+    - 同じタイトルの処理が進行中の場合は、その結果を待つ（計算は1回だけ）
+    - timeout を指定すると、時間内に終わらなかった場合 asyncio.TimeoutError になる
+    - 待っている呼び出しが全てタイムアウト・キャンセルされた場合、
+      まだ始まっていない処理は取り消す
+
+    use_processes=True（デフォルト）の場合はプロセス、False の場合はスレッドで処理する。
+    結合語の作成などPythonで行う処理はGILを取るので、スレッドではイベントループと
+    GILを奪い合う。スレッドで並列に進むのは、MeCabがGILを手放している解析の間だけ。
+    kwargs は Yuragi() にそのまま渡す（プロセスの場合はpickleできる値のみ）。
+    '''
+
+    def __init__(self, max_workers=None, use_processes=True, **kwargs):
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.kwargs = kwargs
+        self._executor = None
+        # タイトル -> [処理中のfuture, 待っている呼び出しの数]
+        self._inflight = {}
+
+    def _get_executor(self):
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.use_processes \
+                else ThreadPoolExecutor
+            self._executor = executor_class(
+                max_workers=self.max_workers, initializer=tagger.warm_up)
+        return self._executor
+
+    async def start(self):
+        '''ワーカーを起動して、辞書を読み込んでおく
+        '''
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*[
+            loop.run_in_executor(executor, tagger.warm_up)
+            for _ in range(self.max_workers)])
+
+    async def generate(self, title, timeout=None):
+        '''ゆらぎ候補語を作成する
+
+        戻り値は Yuragi(title).generate() と同じ。
+        divided はタイトルをそのまま分割するので、結果を共有するのは
+        空白なども含めて同じタイトルの処理だけ。
+        '''
+        key = title
+        entry = self._inflight.get(key)
+        if entry is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._get_executor(), _generate, title, self.kwargs)
+            entry = self._inflight[key] = [future, 0]
+            future.add_done_callback(lambda _: self._discard(key, entry))
+        future = entry[0]
+        entry[1] += 1
+        try:
+            # 他の呼び出しも待っているので、タイムアウトしてもfuture自体は取り消さない
+            words = await asyncio.wait_for(asyncio.shield(future), timeout)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not future.done():
+                future.cancel()
+                self._discard(key, entry)
+        # 同じ結果を複数の呼び出しで共有しているので、コピーして返す
+        return {pattern: list(word_list) for pattern, word_list in words.items()}
+
+    def _discard(self, key, entry):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    async def close(self):
+        if self._executor is not None:
+            executor = self._executor
+            self._executor = None
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, executor.shutdown)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,248 @@
+'''ゆらぎ候補語ジェネレータのベンチマーク
+
+処理の段階ごとの所要時間と、タイトルあたりの処理速度、メモリ使用量のピーク、
+import にかかる時間を測り、結果をJSONで出力する。
+リリース間で結果を比べれば、性能の劣化に気づける。
+例：
+    $ python yuragi/benchmark.py --repeat 5 --output bench.json
+    $ python yuragi/benchmark.py --import-budget 50  # import が50msを超えたら失敗する
+'''
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import tagger
+from remove import remove_subtitle, remove_series
+from yuragi import Yuragi
+
+# ベンチマーク結果のフォーマットのバージョン
+# 結果のキーを変えたときは上げること
+RESULT_VERSION = 2
+
+DEFAULT_CORPUS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'benchmark_titles.txt')
+
+# 新しいPythonプロセスで import yuragi の時間を測るスクリプト
+# MeCabを使わない divided パターンの後でも、重いモジュールが読み込まれていないかを調べる
+IMPORT_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from yuragi import Yuragi
+elapsed = time.perf_counter() - start
+from lazy import loaded_heavy_modules
+after_import = loaded_heavy_modules()
+Yuragi(sys.argv[1]).generate(patterns=['divided'])
+print(json.dumps({'import_sec': elapsed, 'heavy_after_import': after_import,
+                  'heavy_after_divided': loaded_heavy_modules()}))
+'''
+
+
+def load_corpus(path=DEFAULT_CORPUS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+def length_class(title):
+    '''タイトルを文字数で short / medium / long に分ける
+    '''
+    if len(title) < 10:
+        return 'short'
+    if len(title) < 20:
+        return 'medium'
+    return 'long'
+
+
+class StageTimer:
+    '''段階ごとの所要時間を集計する
+    '''
+
+    def __init__(self):
+        self.stages = {}
+
+    def measure(self, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        stage = self.stages.setdefault(
+            name, {'calls': 0, 'total_sec': 0.0, 'min_sec': None})
+        stage['calls'] += 1
+        stage['total_sec'] += elapsed
+        if stage['min_sec'] is None or elapsed < stage['min_sec']:
+            stage['min_sec'] = elapsed
+        return result
+
+    def report(self):
+        report = {}
+        for name, stage in self.stages.items():
+            report[name] = dict(stage)
+            report[name]['mean_sec'] = stage['total_sec'] / stage['calls']
+        return report
+
+
+def bench_stages(titles, repeat):
+    '''段階ごとの所要時間を測る
+
+    _get_features 以外の段階は、解析済みの素性を使った状態で測る。
+    '''
+    timer = StageTimer()
+    for _ in range(repeat):
+        timer.measure(
+            'tagger_construction',
+            tagger.TaggerManager().get_tagger, tagger.get_tagger_options())
+        for title in titles:
+            obj = Yuragi(title)
+            obj._features_memo.clear()
+            timer.measure('_get_features', obj._get_features, title)
+            timer.measure('remove_subtitle', remove_subtitle, title)
+            timer.measure('remove_series', remove_series, title)
+            cleaned_text = timer.measure('_clean_text', obj._clean_text, title)
+            timer.measure('_make_divided_titles', obj._make_divided_titles, title)
+            # 除去後のタイトルを先に解析しておく
+            obj._get_features(cleaned_text)
+            obj._get_features(cleaned_text, use_neologd=True)
+            timer.measure(
+                '_make_unique_katakana', obj._make_unique_katakana, cleaned_text)
+            timer.measure(
+                '_make_acronym_combination_words',
+                obj._make_acronym_combination_words,
+                obj._get_features(cleaned_text))
+            obj.generate()
+            timer.measure('get_words', obj.get_words)
+    return timer.report()
+
+
+def bench_single(titles, repeat):
+    '''Yuragi(title).generate() を1件ずつ実行したときの処理速度を測る
+    '''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for title in titles:
+            Yuragi(title).generate()
+    elapsed = time.perf_counter() - start
+    return {'titles': len(titles) * repeat, 'total_sec': elapsed,
+            'titles_per_sec': len(titles) * repeat / elapsed}
+
+
+def bench_batch(titles, repeat, chunk_size):
+    '''Yuragi.generate_many() でまとめて実行したときの処理速度を測る
+    '''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _ in Yuragi.generate_many(titles, chunk_size=chunk_size):
+            pass
+    elapsed = time.perf_counter() - start
+    return {'titles': len(titles) * repeat, 'total_sec': elapsed,
+            'titles_per_sec': len(titles) * repeat / elapsed}
+
+
+def bench_memory(titles, chunk_size):
+    '''1件ずつとまとめての実行を1回ずつ行い、Pythonのオブジェクトが確保したメモリのピークを測る
+
+    tracemalloc を有効にすると処理が遅くなるので、時間の計測とは別に行う。
+    '''
+    tracemalloc.start()
+    try:
+        for title in titles:
+            Yuragi(title).generate()
+        for _ in Yuragi.generate_many(titles, chunk_size=chunk_size):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def bench_import(title, repeat):
+    '''新しいPythonプロセスで import yuragi にかかる時間を測る
+
+    プロセスの起動時間は含まない。
+    '''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    result = None
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SCRIPT, title], cwd=root,
+            check=True, stdout=subprocess.PIPE).stdout
+        result = json.loads(output)
+        samples.append(result['import_sec'])
+    return {'min_sec': min(samples), 'mean_sec': sum(samples) / len(samples),
+            'heavy_after_import': result['heavy_after_import'],
+            'heavy_after_divided': result['heavy_after_divided']}
+
+
+def run(titles, repeat=3, chunk_size=64):
+    # 他の計測で読み込んだモジュールの影響を受けないように、最初に測る
+    import_time = bench_import(titles[0], repeat)
+
+    # 辞書の読み込みは tagger_construction で別に測るので、先に済ませておく
+    tagger.warm_up()
+
+    stages = bench_stages(titles, repeat)
+
+    throughput = {'single': bench_single(titles, repeat),
+                  'batch': bench_batch(titles, repeat, chunk_size)}
+    by_length = {}
+    for title in titles:
+        by_length.setdefault(length_class(title), []).append(title)
+    throughput['single_by_length'] = {
+        name: bench_single(group, repeat) for name, group in by_length.items()}
+    peak = bench_memory(titles, chunk_size)
+
+    return {
+        'version': RESULT_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'corpus_size': len(titles),
+        'stages': stages,
+        'throughput': throughput,
+        'import': import_time,
+        'peak_memory': {
+            # Pythonのオブジェクトが確保したメモリのピーク
+            'tracemalloc_bytes': peak,
+            # MeCabの辞書なども含めたプロセス全体のピーク（Linuxでは KB 単位）
+            'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ゆらぎ候補語ジェネレータのベンチマーク')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS_PATH,
+                        help='タイトルを1行ずつ書いたファイル')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='コーパスを繰り返す回数（デフォルト: 3）')
+    parser.add_argument('--chunk-size', type=int, default=64,
+                        help='generate_many に渡すチャンクサイズ（デフォルト: 64）')
+    parser.add_argument('--output', default='-',
+                        help='結果を書き出すファイル。省略時は標準出力')
+    parser.add_argument('--import-budget', type=float, default=None,
+                        help='import にかけてよい時間（ミリ秒）。超えた場合は終了コード1で終わる')
+    args = parser.parse_args(argv)
+
+    result = run(load_corpus(args.corpus), repeat=args.repeat,
+                 chunk_size=args.chunk_size)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        sys.stdout.write(text + '\n')
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+    if args.import_budget is not None:
+        import_ms = result['import']['min_sec'] * 1000
+        if import_ms > args.import_budget:
+            sys.stderr.write('import took {0:.1f}ms (budget: {1:.1f}ms)\n'.format(
+                import_ms, args.import_budget))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
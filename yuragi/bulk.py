@@ -0,0 +1,100 @@
+'''カタログ全体を処理するときの、短縮語の素の一括作成
+
+generate_many() では、チャンク内の全てのタイトルの形態素を列（配列）に集め、
+短縮語の素（表層形2字、表層形1字、カタカナ2字、ひらがな2字）を
+異なる形態素ごとにチャンクで1回だけ作る。
+「の」の前後によく出る名詞やシリーズ名のような、多くのタイトルに出てくる形態素も、
+変換は出現ごとではなくチャンクごとに1回で済む。
+タイトルごとの結合語は、add_title() が返したタイトルの番号で
+形態素IDの配列から短縮語の素を引いて組み合わせるので、
+タイトルごとにノイズ除去や形態素の引き直しはしない。
+'''
+from array import array
+
+from variant_cache import make_token_parts
+
+
+def token_key(feature):
+    '''短縮語の素が同じになる形態素を同一視するためのキー
+    '''
+    return (feature.surface, feature.pronunciation)
+
+
+class TokenColumns:
+    '''チャンク内のタイトルの形態素を、列の形で持つ
+
+    異なる形態素ごとの列（表層形、発音、短縮語の素）と、
+    タイトルごとの形態素IDの配列（token_ids を offsets で区切ったもの）からなる。
+    '''
+
+    def __init__(self):
+        # 異なる形態素ごとの列。形態素IDが添字になる
+        self.surfaces = []
+        self.pronunciations = []
+        self.parts = []
+        # token_key -> 形態素ID
+        self._ids = {}
+        # タイトルごとの形態素ID。i番目のタイトルは token_ids[offsets[i]:offsets[i + 1]]
+        self.token_ids = array('I')
+        self.offsets = array('Q', [0])
+
+    def _token_id(self, key):
+        token_id = self._ids.get(key)
+        if token_id is None:
+            token_id = self._ids[key] = len(self.surfaces)
+            self.surfaces.append(key[0])
+            self.pronunciations.append(key[1])
+        return token_id
+
+    def add_title(self, features):
+        '''タイトルの形態素（ノイズ除去後）を追加し、タイトルの番号を返す
+        '''
+        token_ids = self.token_ids
+        for feature in features:
+            token_ids.append(self._token_id(token_key(feature)))
+        self.offsets.append(len(token_ids))
+        return len(self.offsets) - 2
+
+    def build(self):
+        '''まだ作っていない形態素の短縮語の素を、まとめて作る
+        '''
+        start = len(self.parts)
+        self.parts.extend(map(
+            make_token_parts,
+            self.surfaces[start:], self.pronunciations[start:]))
+        return self
+
+    def title_token_ids(self, index):
+        return self.token_ids[self.offsets[index]:self.offsets[index + 1]]
+
+    def title_token_keys(self, index):
+        '''index 番目のタイトルの形態素の token_key を、形態素の順番で返す
+        '''
+        token_ids = self.title_token_ids(index)
+        return list(zip(map(self.surfaces.__getitem__, token_ids),
+                        map(self.pronunciations.__getitem__, token_ids)))
+
+    def title_parts(self, index):
+        '''index 番目のタイトルの短縮語の素を、形態素の順番で返す
+        '''
+        return list(map(self.parts.__getitem__, self.title_token_ids(index)))
+
+    def parts_for(self, features):
+        '''形態素のリストの短縮語の素を返す
+
+        タイトルの番号が分からないとき（max_candidates でのランキングなど）に使う。
+        追加されていない形態素があれば、その場で追加して作る。
+        '''
+        ids = self._ids
+        parts = self.parts
+        result = []
+        for feature in features:
+            token_id = ids.get(token_key(feature))
+            if token_id is None or token_id >= len(parts):
+                token_id = self._token_id(token_key(feature))
+                self.build()
+            result.append(parts[token_id])
+        return result
+
+    def __len__(self):
+        return len(self.surfaces)
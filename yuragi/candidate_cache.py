@@ -0,0 +1,189 @@
+'''ゆらぎ候補語を保存しておく、SQLiteのキャッシュ
+
+タイトルごとの generate() の結果を保存しておき、次回以降はMeCabを使わずに返す。
+キャッシュのキーは、タイトル（そのままの文字列）と、辞書・生成ルールのフィンガープリント。
+divided はタイトルをそのまま分割するので、空白が違うだけのタイトルも別々に保存する。
+辞書や生成ルールが変わるとフィンガープリントが変わるので、古い結果は使われない。
+例：
+    $ python yuragi/candidate_cache.py cache.sqlite3 --invalidate-stale
+'''
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from lazy import lazy_import
+from morpheme import pos_name
+from remove import CLEANING_RULES, NOISE_POS
+from settings import NEOLOGD_PATH
+
+MeCab = lazy_import('MeCab')
+
+# 生成ルールのバージョン
+# 生成パターンの処理を変えて、結果が変わるようになったときは上げること
+RULES_VERSION = 3
+
+
+def dictionary_fingerprint():
+    '''辞書を識別する文字列を返す
+
+    MeCabのバージョンと、NEOLOGDのパスと更新日時から作る。
+    '''
+    parts = [getattr(MeCab, 'VERSION', ''), NEOLOGD_PATH]
+    sys_dic = os.path.join(NEOLOGD_PATH, 'sys.dic')
+    if os.path.exists(sys_dic):
+        stat = os.stat(sys_dic)
+        parts.extend([str(stat.st_size), str(stat.st_mtime)])
+    return '\t'.join(parts)
+
+
+def rules_fingerprint():
+    '''生成ルールを識別する文字列を返す
+
+    RULES_VERSION と、テキストの除去ルール・ノイズとみなす品詞から作る。
+    '''
+    parts = [str(RULES_VERSION)]
+    for rule in CLEANING_RULES:
+        if hasattr(rule, 'pattern'):
+            parts.append('{0}:{1}'.format(type(rule).__name__, rule.pattern.pattern))
+        else:
+            parts.append('{0}:{1}'.format(type(rule).__name__, rule.func.__name__))
+    parts.extend(sorted(pos_name(pid) for pid in NOISE_POS))
+    return '\t'.join(parts)
+
+
+def generator_fingerprint():
+    text = dictionary_fingerprint() + '\n' + rules_fingerprint()
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class CandidateCache:
+    '''ゆらぎ候補語のSQLiteキャッシュ
+
+    variant には、同じタイトルでも結果が変わる生成オプション
+    （クラス名や max_candidates など）を表す文字列を渡す。
+    複数のスレッドから使えるように、操作はロックで保護している。
+    '''
+
+    def __init__(self, path, fingerprint=None):
+        if fingerprint is None:
+            fingerprint = generator_fingerprint()
+        self.path = path
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS candidates ('
+            ' title TEXT NOT NULL,'
+            ' variant TEXT NOT NULL,'
+            ' fingerprint TEXT NOT NULL,'
+            ' words TEXT NOT NULL,'
+            ' PRIMARY KEY (title, variant, fingerprint))')
+        self._connection.commit()
+
+    def get(self, title, variant=''):
+        '''キャッシュされた words を返す。無ければ None を返す
+        '''
+        return self.get_many([title], variant).get(title)
+
+    def get_many(self, titles, variant=''):
+        '''キャッシュされている分だけ {title: words} で返す
+        '''
+        result = {}
+        titles = list(dict.fromkeys(titles))
+        with self._lock:
+            # SQLiteのプレースホルダ数の上限に収まるように分けて引く
+            for start in range(0, len(titles), 500):
+                part = titles[start:start + 500]
+                rows = self._connection.execute(
+                    'SELECT title, words FROM candidates'
+                    ' WHERE variant = ? AND fingerprint = ?'
+                    ' AND title IN ({0})'.format(','.join('?' * len(part))),
+                    [variant, self.fingerprint] + part).fetchall()
+                for title, words in rows:
+                    result[title] = json.loads(words)
+        return result
+
+    def set(self, title, words, variant=''):
+        self.set_many([(title, words)], variant)
+
+    def set_many(self, items, variant=''):
+        '''(title, words) のiterableをまとめて保存する
+        '''
+        rows = [(title, variant, self.fingerprint,
+                 json.dumps(words, ensure_ascii=False))
+                for title, words in items]
+        with self._lock:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO candidates'
+                ' (title, variant, fingerprint, words) VALUES (?, ?, ?, ?)',
+                rows)
+            self._connection.commit()
+
+    def invalidate_stale(self):
+        '''現在のフィンガープリントと異なる（古い辞書やルールで作った）結果を削除する
+
+        削除した件数を返す。
+        '''
+        with self._lock:
+            cursor = self._connection.execute(
+                'DELETE FROM candidates WHERE fingerprint != ?',
+                [self.fingerprint])
+            self._connection.commit()
+        return cursor.rowcount
+
+    def invalidate(self, titles):
+        '''指定したタイトルの結果を削除する
+        '''
+        rows = [(title,) for title in titles]
+        with self._lock:
+            self._connection.executemany(
+                'DELETE FROM candidates WHERE title = ?', rows)
+            self._connection.commit()
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute('DELETE FROM candidates')
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM candidates').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ゆらぎ候補語のキャッシュを管理する')
+    parser.add_argument('path', help='キャッシュのファイル')
+    parser.add_argument('--invalidate-stale', action='store_true',
+                        help='古い辞書や生成ルールで作った結果を削除する')
+    parser.add_argument('--invalidate', metavar='TITLE', nargs='+',
+                        help='指定したタイトルの結果を削除する')
+    parser.add_argument('--clear', action='store_true',
+                        help='全ての結果を削除する')
+    args = parser.parse_args(argv)
+
+    with CandidateCache(args.path) as cache:
+        if args.clear:
+            cache.clear()
+        if args.invalidate:
+            cache.invalidate(args.invalidate)
+        if args.invalidate_stale:
+            print('{0} 件削除しました'.format(cache.invalidate_stale()))
+        print('{0} 件保存されています'.format(len(cache)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+from collections import Counter
+
+
+class CandidateGroup:
+    '''1つのタイトル・生成パターンで作られた候補語のまとまり
+
+    words は候補語をキーにしたdictで、重複を除いて作られた順番に並ぶ（値は使わない）。
+    source（結合語なら組み合わせた形態素の位置 (i, j) のような、パターンごとの補足情報）は、
+    候補語ごとに最初に作られたときのものだけを持つ。
+    sources には 候補語 -> source のdictか、そのdictを返す関数を渡す。
+    関数の場合は、出自が初めて必要になったときに一度だけ呼ぶ。
+    '''
+    __slots__ = ('title', 'pattern', 'words', 'count', '_sources', 'shared')
+
+    def __init__(self, title, pattern, words, count, sources=None):
+        self.title = title
+        self.pattern = pattern
+        self.words = words
+        # 重複を除く前の候補語の数
+        self.count = count
+        self._sources = sources
+        # 他の CandidateSet と共有している場合は、add() で候補語を追加しない
+        self.shared = False
+
+    def source(self, word):
+        sources = self._sources
+        if sources is None:
+            return None
+        if callable(sources):
+            sources = self._sources = sources()
+        return sources.get(word)
+
+
+class CandidateSet:
+    '''ゆらぎ候補語の集合
+
+    追加した順番を保ったまま、重複は追加した時点で取り除く。
+    重複の除去はdictで行うので、候補語を1つずつPythonで調べることはない。
+    候補語がどのタイトルのどの生成パターンで作られたか（出自）は、
+    パターンごとの CandidateGroup として持つ。
+
+    by_pattern() は追加した順番どおりにパターンごとのリストを返すので、
+    generate() の戻り値と同じ形になる。
+    '''
+
+    def __init__(self, title=None):
+        self.title = title
+        # 候補語をキーにしたdict（値は使わない）。dictなので最初に追加した順番を保つ
+        self._index = {}
+        self._groups = []
+        # 重複を除く前に追加された候補語の数
+        self.added_count = 0
+
+    @classmethod
+    def from_pattern_words(cls, words: dict, title=None):
+        '''generate() の戻り値（パターン名 -> 候補語のリスト）から作る
+        '''
+        candidates = cls(title)
+        for pattern_name, word_list in words.items():
+            if word_list is not None:
+                candidates.update(word_list, pattern_name)
+        return candidates
+
+    def _add_group(self, group):
+        self._groups.append(group)
+        # 既にある候補語の位置は変わらないので、最初に追加された順番が保たれる
+        self._index.update(group.words)
+        self.added_count += group.count
+
+    def add(self, word, pattern, source=None, title=None):
+        '''候補語を1つ追加する。初めて追加された候補語なら True を返す
+
+        直前に add() したのと同じタイトル・パターンなら、同じまとまりに追加する。
+        '''
+        if title is None:
+            title = self.title
+        group = self._groups[-1] if self._groups else None
+        if (group is None or group.shared or group.title != title or
+                group.pattern != pattern or not isinstance(group._sources, dict)):
+            group = CandidateGroup(title, pattern, {}, 0, {})
+            self._groups.append(group)
+        if word not in group.words:
+            group.words[word] = None
+            if source is not None:
+                group._sources[word] = source
+        group.count += 1
+        self.added_count += 1
+        is_new = word not in self._index
+        if is_new:
+            self._index[word] = None
+        return is_new
+
+    def update(self, words, pattern, title=None, sources=None, count=None):
+        '''パターンで作られた候補語をまとめて追加する
+
+        words はリストか、候補語をキーにしたdict（collections.Counter なら
+        作られた回数を重複を除く前の数として数える）。dictはコピーせずに持つので、
+        渡した後で書き換えないこと。
+        count を指定した場合は、それを重複を除く前の数とする。
+        sources については CandidateGroup を参照。
+        パターン内で重複を除いた候補語数を返す。
+        '''
+        if title is None:
+            title = self.title
+        if isinstance(words, dict):
+            unique = words
+            if count is None:
+                count = sum(words.values()) if isinstance(words, Counter) else len(words)
+        else:
+            words = list(words)
+            unique = dict.fromkeys(words)
+            if count is None:
+                count = len(words)
+        self._add_group(CandidateGroup(title, pattern, unique, count, sources))
+        return len(unique)
+
+    def merge(self, other):
+        '''他の CandidateSet の候補語と出自を、順番を保って追加する
+
+        候補語はコピーせず、other のまとまりをそのまま共有する。
+        '''
+        for group in other._groups:
+            group.shared = True
+            self._add_group(group)
+
+    def words(self, pattern=None):
+        '''重複を除いた候補語のリストを、最初に追加された順番で返す
+
+        pattern を指定した場合は、そのパターンで作られた候補語だけを返す。
+        '''
+        if pattern is None:
+            return list(self._index)
+        words = {}
+        for group in self._groups:
+            if group.pattern == pattern:
+                words.update(group.words)
+        return list(words)
+
+    def by_pattern(self):
+        '''パターン名 -> 候補語のリスト を返す
+
+        パターンごとのリストは、重複を除いて追加した順番のまま。
+        '''
+        result = {}
+        for group in self._groups:
+            result.setdefault(group.pattern, {}).update(group.words)
+        return {pattern: list(words) for pattern, words in result.items()}
+
+    def entries(self):
+        '''(候補語, タイトル, パターン名, source) を追加した順に1つずつ返す
+
+        候補語はまとまりごとに1回だけ返す。別のパターンでも作られた候補語は、
+        パターンごとに返す。
+        '''
+        for group in self._groups:
+            for word in group.words:
+                yield word, group.title, group.pattern, group.source(word)
+
+    def sources(self, word):
+        '''候補語の出自を (タイトル, パターン名, source) のリストで返す
+
+        パターンごとに、最初に作られたときの出自を返す。
+        '''
+        return [(group.title, group.pattern, group.source(word))
+                for group in self._groups if word in group.words]
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __contains__(self, word):
+        return word in self._index
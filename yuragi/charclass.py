@@ -0,0 +1,105 @@
+'''文字種（カタカナ、ひらがな、漢字など）の判定
+
+文字列を str.translate で文字種の記号の列（マスク）に変換し、
+文字列全体の文字種を正規表現を使わずに一度の走査で判定する。
+例：
+    >>> classify_letters('スライム3')
+    'KKKKD'
+    >>> script_of('スライム')
+    'K'
+'''
+from bisect import bisect_right
+
+from snapshot import get_table
+
+KATAKANA = 'K'
+HIRAGANA = 'H'
+KANJI = 'C'
+LATIN = 'L'
+DIGIT = 'D'
+ZENKAKU_DIGIT = 'Z'
+OTHER = 'O'
+# 複数の文字種が混ざっている
+MIXED = 'M'
+
+# (開始コードポイント, 終了コードポイント, 文字種)
+# カタカナと漢字の範囲は utils.is_katakana, utils.is_kanji の正規表現に合わせている
+SCRIPT_RANGES = [
+    (ord('0'), ord('9'), DIGIT),
+    (ord('A'), ord('Z'), LATIN),
+    (ord('a'), ord('z'), LATIN),
+    (ord('ぁ'), ord('ん'), HIRAGANA),
+    (ord('ァ'), ord('ン'), KATAKANA),
+    (ord('ー'), ord('ー'), KATAKANA),
+    (ord('一'), ord('龥'), KANJI),
+    (ord('０'), ord('９'), ZENKAKU_DIGIT),
+    (ord('Ａ'), ord('Ｚ'), LATIN),
+    (ord('ａ'), ord('ｚ'), LATIN),
+]
+_RANGE_STARTS = [start for start, _, _ in SCRIPT_RANGES]
+
+
+class _ScriptTable(dict):
+    '''str.translate に渡す、コードポイント -> 文字種の表
+
+    初めて現れた文字だけ範囲表から文字種を調べ、以降はdictから引く。
+    '''
+
+    def __missing__(self, code):
+        index = bisect_right(_RANGE_STARTS, code) - 1
+        script = OTHER
+        if index >= 0:
+            start, end, range_script = SCRIPT_RANGES[index]
+            if code <= end:
+                script = range_script
+        self[code] = script
+        return script
+
+
+# build_script_table で先に調べておく範囲
+# 漢字は数が多く、表が大きくなって読み込みが遅くなるので含めない
+PREBUILT_RANGES = [
+    (0x0000, 0x007f),  # ASCII
+    (0x3000, 0x30ff),  # 和文の記号、ひらがな、カタカナ
+    (0xff00, 0xffef),  # 全角英数字、半角カタカナ
+]
+
+
+def build_script_table():
+    '''PREBUILT_RANGES の文字の文字種を、先に調べておいた表を返す
+    '''
+    table = _ScriptTable()
+    for start, end in PREBUILT_RANGES:
+        for code in range(start, end + 1):
+            table[code]
+    return dict(table)
+
+
+SCRIPT_TABLE = _ScriptTable(get_table('script_table') or ())
+
+
+def classify_letters(text: str):
+    '''1文字ずつ文字種に変換した文字列（マスク）を返す
+    '''
+    return text.translate(SCRIPT_TABLE)
+
+
+def script_of(text: str):
+    '''文字列全体の文字種を返す
+
+    全ての文字が同じ文字種ならその文字種を、混ざっていれば MIXED を、
+    空文字列なら None を返す。
+    '''
+    if not text:
+        return None
+    mask = classify_letters(text)
+    script = mask[0]
+    if mask.count(script) == len(mask):
+        return script
+    return MIXED
+
+
+def classify_tokens(tokens: list):
+    '''語のリストから、語ごとの文字種のリストを返す
+    '''
+    return [script_of(token) for token in tokens]
@@ -0,0 +1,327 @@
+'''ゆらぎ候補語の生成結果を、列指向のファイルに書き出す
+
+分析用のジョブでは、カタログ全体の結果を何度も読み込む。
+generate() の戻り値（dictとリスト）をpickleやJSONにすると、
+小さなリストを大量に作り直すことになるので、列指向の形式で保存する。
+
+- 行は (タイトルID, パターンID, 候補語ID, source の形態素の位置)
+- 文字列（タイトル、パターン名、候補語）は辞書化して、列にはIDだけを入れる
+- 行は batch_size 行ずつのバッチで書き出すので、全体をメモリに持たずに済む
+- ResultReader はファイルをメモリマップし、列はコピーせずに memoryview で読む
+例：
+    >>> with ResultWriter('results.yrgc') as writer:
+    ...     for title, words in Yuragi.generate_many(titles):
+    ...         writer.add(title, words)
+    >>> with ResultReader('results.yrgc') as reader:
+    ...     candidates = reader.candidate_set('転生したらスライムだった件')
+    ...     candidates.sources('転スラ')
+
+ファイルの構成（数値はリトルエンディアン）
+- ヘッダ: magic, バージョン
+- バッチ: タイトルID、パターンID、候補語ID（それぞれuint32の行数分）、
+  source のオフセット（uint32の行数+1件）、source の形態素の位置（uint32）
+- 文字列の辞書: オフセット表（uint64の件数+1件）、UTF-8を連結したもの
+- フッタ: バッチと辞書の位置を書いたJSON
+- 末尾: フッタの長さ（uint64）、magic
+'''
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from candidates import CandidateSet
+
+MAGIC = b'YRGC'
+FORMAT_VERSION = 1
+# magic, バージョン
+HEADER = struct.Struct('<4sI')
+# フッタの長さ, magic
+TRAILER = struct.Struct('<Q4s')
+# バッチの列の名前。この順番で書き出す
+BATCH_COLUMNS = ('title_id', 'pattern_id', 'candidate_id', 'source_offsets', 'sources')
+# 文字列の辞書の名前
+DICTIONARIES = ('titles', 'patterns', 'candidates')
+
+
+def _native_array(values):
+    '''ファイルの値（リトルエンディアン）と同じバイト順の array を返す
+    '''
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+class _StringDictionary:
+    '''文字列 -> ID の辞書。IDは追加した順の番号
+    '''
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def get_id(self, value):
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+
+class ResultWriter:
+    '''生成結果を列指向のファイルに書き出す
+
+    close() したときに文字列の辞書とフッタを書き出すので、
+    with 文で使うか、必ず close() を呼ぶこと。
+    '''
+
+    def __init__(self, path, batch_size=65536):
+        self.path = path
+        self.batch_size = batch_size
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION))
+        self._dictionaries = {name: _StringDictionary() for name in DICTIONARIES}
+        self._batches = []
+        self._reset_batch()
+
+    def _reset_batch(self):
+        self._columns = {name: array('I') for name in BATCH_COLUMNS}
+        self._columns['source_offsets'].append(0)
+
+    def add(self, title, words):
+        '''タイトルと、generate() の戻り値か CandidateSet を書き出す
+        '''
+        if not isinstance(words, CandidateSet):
+            words = CandidateSet.from_pattern_words(words, title)
+        self.add_candidates(words, title)
+
+    def add_yuragi(self, yuragi):
+        '''generate() 済みの Yuragi の候補語を、出自と一緒に書き出す
+        '''
+        self.add_candidates(yuragi.candidates, yuragi.text)
+
+    def add_candidates(self, candidates, title=None):
+        '''CandidateSet の候補語を、追加された順番のまま書き出す
+
+        候補語のタイトルが None の場合は title を使う。
+        候補語が1つも無いタイトルも、タイトルの辞書には登録する。
+        '''
+        titles = self._dictionaries['titles']
+        if title is None:
+            title = candidates.title
+        if title is not None:
+            titles.get_id(title)
+        patterns = self._dictionaries['patterns']
+        words = self._dictionaries['candidates']
+        columns = self._columns
+        for word, entry_title, pattern, source in candidates.entries():
+            if entry_title is None:
+                entry_title = title
+            columns['title_id'].append(titles.get_id(entry_title))
+            columns['pattern_id'].append(patterns.get_id(pattern))
+            columns['candidate_id'].append(words.get_id(word))
+            if source is not None:
+                columns['sources'].extend(source)
+            columns['source_offsets'].append(len(columns['sources']))
+            if len(columns['title_id']) >= self.batch_size:
+                self._flush_batch()
+                columns = self._columns
+
+    def _write_array(self, values):
+        '''配列を書き出し、(先頭の位置, 件数) を返す
+        '''
+        position = self._file.tell()
+        self._file.write(_native_array(values).tobytes())
+        return position, len(values)
+
+    def _align(self, size):
+        padding = -self._file.tell() % size
+        self._file.write(b'\0' * padding)
+
+    def _flush_batch(self):
+        columns = self._columns
+        if not columns['title_id']:
+            return
+        batch = {'rows': len(columns['title_id'])}
+        for name in BATCH_COLUMNS:
+            batch[name] = self._write_array(columns[name])
+        self._batches.append(batch)
+        self._reset_batch()
+
+    def close(self):
+        if self._file is None:
+            return
+        self._flush_batch()
+        dictionaries = {}
+        for name in DICTIONARIES:
+            blob = bytearray()
+            offsets = array('Q', [0])
+            for value in self._dictionaries[name].values:
+                blob += value.encode('utf-8')
+                offsets.append(len(blob))
+            self._align(offsets.itemsize)
+            offset_position, count = self._write_array(offsets)
+            blob_position = self._file.tell()
+            self._file.write(blob)
+            dictionaries[name] = {'offsets': offset_position, 'count': count - 1,
+                                  'blob': blob_position}
+        footer = json.dumps({'batches': self._batches,
+                             'dictionaries': dictionaries}).encode('utf-8')
+        self._file.write(footer)
+        self._file.write(TRAILER.pack(len(footer), MAGIC))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ResultReader:
+    '''ResultWriter で書き出したファイルを、メモリマップして読み込む
+
+    列は memoryview で返すので、ファイルの内容はコピーされない。
+    文字列は必要になったときに辞書から取り出す。
+    '''
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if len(self._mmap) < HEADER.size + TRAILER.size:
+            self.close()
+            raise ValueError('not a yuragi result file: {0}'.format(path))
+        magic, version = HEADER.unpack_from(self._mmap, 0)
+        footer_size, trailer_magic = TRAILER.unpack_from(
+            self._mmap, len(self._mmap) - TRAILER.size)
+        if magic != MAGIC or trailer_magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError('not a yuragi result file: {0}'.format(path))
+        footer_end = len(self._mmap) - TRAILER.size
+        footer = json.loads(bytes(self._mmap[footer_end - footer_size:footer_end]))
+        self._batches = footer['batches']
+        self._dictionaries = footer['dictionaries']
+        # 辞書の名前 -> オフセット表
+        self._string_offsets = {}
+        self._title_ids = None
+
+    def _array(self, position, count, typecode):
+        itemsize = array(typecode).itemsize
+        view = self._view[position:position + count * itemsize].cast(typecode)
+        if sys.byteorder == 'big':
+            return _native_array(array(typecode, view))
+        return view
+
+    def _column(self, batch, name):
+        position, count = batch[name]
+        return self._array(position, count, 'I')
+
+    def _string(self, name, value_id):
+        dictionary = self._dictionaries[name]
+        offsets = self._string_offsets.get(name)
+        if offsets is None:
+            offsets = self._string_offsets[name] = self._array(
+                dictionary['offsets'], dictionary['count'] + 1, 'Q')
+        start = dictionary['blob'] + offsets[value_id]
+        end = dictionary['blob'] + offsets[value_id + 1]
+        return str(self._mmap[start:end], 'utf-8')
+
+    def strings(self, name):
+        '''文字列の辞書（titles, patterns, candidates）をIDの順にリストで返す
+        '''
+        count = self._dictionaries[name]['count']
+        return [self._string(name, value_id) for value_id in range(count)]
+
+    def iter_batches(self):
+        '''バッチごとに、列の名前 -> memoryview のdictを返す
+        '''
+        for batch in self._batches:
+            yield {name: self._column(batch, name) for name in BATCH_COLUMNS}
+
+    def iter_rows(self):
+        '''(タイトル, パターン名, 候補語, source) を書き出した順に1つずつ返す
+        '''
+        titles = self.strings('titles')
+        patterns = self.strings('patterns')
+        words = self.strings('candidates')
+        for columns in self.iter_batches():
+            yield from self._decode_rows(columns, range(len(columns['title_id'])),
+                                         titles, patterns, words)
+
+    def _decode_rows(self, columns, rows, titles, patterns, words):
+        source_offsets = columns['source_offsets']
+        sources = columns['sources']
+        for row in rows:
+            start = source_offsets[row]
+            end = source_offsets[row + 1]
+            source = tuple(sources[start:end]) if end > start else None
+            yield (titles[columns['title_id'][row]],
+                   patterns[columns['pattern_id'][row]],
+                   words[columns['candidate_id'][row]], source)
+
+    def candidate_sets(self):
+        '''タイトル -> CandidateSet のdictを、書き出された順番で返す
+        '''
+        result = {title: CandidateSet(title) for title in self.strings('titles')}
+        for title, pattern, word, source in self.iter_rows():
+            result[title].add(word, pattern, source)
+        return result
+
+    def candidate_set(self, title):
+        '''1つのタイトルの CandidateSet を返す。書き出されていなければ None を返す
+
+        タイトルIDの列を走査して、そのタイトルの行の文字列だけを取り出す。
+        '''
+        if self._title_ids is None:
+            self._title_ids = {value: value_id for value_id, value
+                               in enumerate(self.strings('titles'))}
+        title_id = self._title_ids.get(title)
+        if title_id is None:
+            return None
+        patterns = self.strings('patterns')
+        words = _LazyStrings(self, 'candidates')
+        titles = {title_id: title}
+        candidates = CandidateSet(title)
+        for columns in self.iter_batches():
+            rows = [row for row, value in enumerate(columns['title_id'])
+                    if value == title_id]
+            for _, pattern, word, source in self._decode_rows(
+                    columns, rows, titles, patterns, words):
+                candidates.add(word, pattern, source)
+        return candidates
+
+    def __len__(self):
+        return sum(batch['rows'] for batch in self._batches)
+
+    def close(self):
+        '''ファイルを閉じる
+
+        iter_batches() で受け取った memoryview を持ったままだと、閉じられない。
+        '''
+        if self._mmap is not None:
+            self._string_offsets = {}
+            self._view.release()
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _LazyStrings:
+    '''文字列の辞書を、IDで引かれたときに1つずつ取り出す
+    '''
+
+    def __init__(self, reader, name):
+        self.reader = reader
+        self.name = name
+
+    def __getitem__(self, value_id):
+        return self.reader._string(self.name, value_id)
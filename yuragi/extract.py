@@ -1,4 +1,13 @@
-import utils
+from morpheme import (
+    POS_NOUN,
+    POS_PARTICLE,
+    POS_CASE_PARTICLE,
+    POS_BINDING_PARTICLE,
+    POS_PRONOUN,
+    POS_PROPER_NOUN,
+    POS_SUFFIX,
+    POS_NUMBER
+)
 
 
 def extract_subject(features: list):
@@ -7,11 +16,11 @@ def extract_subject(features: list):
     主語の次に現れる助詞を見つけ、その一つ前にある語を主語として抽出する。
     '''
     words = []
-    for index, features in enumerate(features):
-        # MeCab出力フォーマットから必要な素性を取り出す
-        word = features[0]  # 表層形
-        pos = features[1]  # 品詞
-        pos_detail = features[2]  # 品詞詳分類1
+    for index, feature in enumerate(features):
+        # 必要な素性を取り出す
+        word = feature.surface  # 表層形
+        pos = feature.pos  # 品詞
+        pos_detail = feature.pos_detail  # 品詞詳分類1
         # 主語のあとに来る「は」「が」を見つけようとしている
         # 「は」「が」は品詞が「助詞」であり、品詞詳分類1が「格助詞」「係助詞」であると考えられる
         #
@@ -26,9 +35,9 @@ def extract_subject(features: list):
         #  ['ます', '助動詞', '*', '*', '*', '特殊・マス', '基本形', 'ます', 'マス', 'マス']]
         # この場合、出力結果は ['恋']となる。
         if (word == 'は' or word == 'が') and \
-                pos == '助詞' and \
-                (pos_detail == '格助詞' or pos_detail == '係助詞'):
-            prev_word = features[index-1][0]
+                pos == POS_PARTICLE and \
+                (pos_detail == POS_CASE_PARTICLE or pos_detail == POS_BINDING_PARTICLE):
+            prev_word = features[index-1].surface
             words.append(prev_word)
     return words
 
@@ -38,8 +47,8 @@ def extract_pronouns(features: list):
     '''
     words = []
     for feature in features:
-        if feature[1] == '名詞' and feature[2] == '代名詞':
-            words.append(feature[0])
+        if feature.pos == POS_NOUN and feature.pos_detail == POS_PRONOUN:
+            words.append(feature.surface)
     return words
 
 
@@ -48,8 +57,8 @@ def extract_proper_nouns(features: list):
     '''
     words = []
     for feature in features:
-        if feature[1] == '名詞' and feature[2] == '固有名詞':
-            words.append(feature[0])
+        if feature.pos == POS_NOUN and feature.pos_detail == POS_PROPER_NOUN:
+            words.append(feature.surface)
     return words
 
 
@@ -58,8 +67,8 @@ def extract_suffix(features: list):
     '''
     words = []
     for feature in features:
-        if feature[1] == '名詞' and feature[2] == '接尾':
-            words.append(feature[0])
+        if feature.pos == POS_NOUN and feature.pos_detail == POS_SUFFIX:
+            words.append(feature.surface)
     return words
 
 
@@ -68,6 +77,6 @@ def extract_number(features: list):
     '''
     words = []
     for feature in features:
-        if feature[1] == '名詞' and feature[2] == '数':
-            words.append(feature[0])
+        if feature.pos == POS_NOUN and feature.pos_detail == POS_NUMBER:
+            words.append(feature.surface)
     return words
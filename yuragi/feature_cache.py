@@ -0,0 +1,60 @@
+import threading
+from collections import OrderedDict
+
+from tagger import get_tagger_options, parse_features
+
+
+def normalize_text(text: str):
+    '''キャッシュのキーにするため、テキストを正規化する
+
+    前後の空白はMeCabの解析結果に影響しないので取り除く。
+    '''
+    return text.strip()
+
+
+class FeatureCache:
+    '''素性のLRUキャッシュ
+
+    (正規化したテキスト, MeCabのオプション) をキーにして、解析済みの素性を保持する。
+    複数のインスタンスで共有できるように、操作はロックで保護している。
+    キャッシュした素性は共有されるので、呼び出し側で書き換えないこと。
+    '''
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def prefetch_features(texts, feature_cache, use_neologd=False):
+    '''複数のテキストをまとめて解析し、feature_cacheに格納する
+
+    同じ辞書のテキストを続けて解析するので、Taggerを切り替えずに済む。
+    解析済みのテキストは飛ばす。
+    '''
+    options = get_tagger_options(use_neologd)
+    for text in texts:
+        key = (normalize_text(text), options)
+        if feature_cache.get(key) is None:
+            feature_cache.set(key, parse_features(key[0], use_neologd=use_neologd))
@@ -0,0 +1,50 @@
+'''重いモジュールを、初めて使われたときに読み込むための仕組み
+
+MeCab、jaconv、mojimoji は読み込みに時間がかかるので、
+import しただけでは読み込まず、属性が初めて参照されたときに読み込む。
+divided パターンだけを使うような、MeCabを使わない処理では読み込まれない。
+例：
+    MeCab = lazy_import('MeCab')
+    MeCab.Model(options)  # ここで初めて MeCab が読み込まれる
+'''
+import importlib
+import sys
+
+# 遅延して読み込む重いモジュール
+HEAVY_MODULES = ('MeCab', 'jaconv', 'mojimoji')
+
+
+class LazyModule:
+    '''属性が初めて参照されたときに、モジュールを読み込む代理オブジェクト
+    '''
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return '<lazy module {0!r} ({1})>'.format(self.__dict__['_name'], state)
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def loaded_heavy_modules():
+    '''すでに読み込まれている重いモジュールの名前のリストを返す
+    '''
+    return [name for name in HEAVY_MODULES if name in sys.modules]
@@ -0,0 +1,171 @@
+'''ゆらぎ候補語を文章の中から探す、Aho-Corasick法のマッチャー
+
+全ての候補語から一度だけオートマトンを作り、文章は1文字ずつ1回走査するだけで
+含まれている候補語を全て見つける。候補語の数が多くても走査の手間は増えない。
+例：
+    >>> matcher = Matcher.from_results(Yuragi.generate_many(titles))
+    >>> list(matcher.match('転スラの新刊読んだ'))
+    [('転生したらスライムだった件', '転スラ', 0), ...]
+
+Matcher は普通のPythonオブジェクトだけで出来ているので、
+pickleしてワーカープロセスに渡すことができる。
+'''
+from collections import deque
+
+from utils import HIRA2KATA_TABLE
+
+
+def _flatten_words(words):
+    '''generate() の戻り値（dict）と get_words() の戻り値（list）のどちらも受け付ける
+    '''
+    if isinstance(words, dict):
+        result = []
+        for word_list in words.values():
+            if word_list is not None:
+                result.extend(word_list)
+        return result
+    return words
+
+
+class Matcher:
+    '''候補語のAho-Corasickオートマトン
+
+    min_length 字未満の候補語は、どんな文章にも含まれやすいので登録しない。
+    normalize=True の場合は、ひらがなをカタカナにそろえてから照合する。
+    '''
+
+    def __init__(self, min_length=2, normalize=False):
+        self.min_length = min_length
+        self.normalize = normalize
+        # 状態ごとの遷移（文字 -> 状態）
+        self._goto = [{}]
+        # 状態ごとの失敗時の遷移先
+        self._fail = [0]
+        # 状態ごとに、そこで見つかる候補語のID
+        self._outputs = [()]
+        # 候補語のID -> (候補語, タイトルのタプル)
+        self._patterns = []
+        self._pattern_ids = {}
+        self._compiled = False
+
+    @classmethod
+    def from_results(cls, results, **kwargs):
+        '''(title, words) のiterableから作る
+
+        words は generate() の戻り値でも get_words() の戻り値でも良い。
+        '''
+        matcher = cls(**kwargs)
+        for title, words in results:
+            matcher.add(title, _flatten_words(words))
+        matcher.compile()
+        return matcher
+
+    def _normalize(self, text):
+        if self.normalize:
+            return text.translate(HIRA2KATA_TABLE)
+        return text
+
+    def add(self, title, words):
+        '''タイトルと候補語を登録する
+
+        compile() した後は登録できない。
+        '''
+        if self._compiled:
+            raise RuntimeError('Matcher is already compiled')
+        for word in words:
+            if len(word) < self.min_length:
+                continue
+            key = self._normalize(word)
+            pattern_id = self._pattern_ids.get(key)
+            if pattern_id is None:
+                pattern_id = self._pattern_ids[key] = len(self._patterns)
+                self._patterns.append((word, []))
+                self._insert(key, pattern_id)
+            titles = self._patterns[pattern_id][1]
+            if title not in titles:
+                titles.append(title)
+
+    def _insert(self, key, pattern_id):
+        state = 0
+        for letter in key:
+            next_state = self._goto[state].get(letter)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][letter] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(())
+            state = next_state
+        self._outputs[state] = self._outputs[state] + (pattern_id,)
+
+    def compile(self):
+        '''失敗時の遷移先を計算して、照合できる状態にする
+
+        既に compile() 済みの場合は何もしない。
+        '''
+        if self._compiled:
+            return self
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for letter, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and letter not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(letter, 0)
+                self._fail[next_state] = fail
+                self._outputs[next_state] += self._outputs[fail]
+        self._patterns = [(word, tuple(titles)) for word, titles in self._patterns]
+        self._compiled = True
+        return self
+
+    def match(self, text):
+        '''text に含まれる候補語を (title, candidate, offset) で1つずつ返す
+
+        offset は候補語が始まる位置。
+        '''
+        stream = self.stream()
+        yield from stream.feed(text)
+
+    def stream(self):
+        '''文章を少しずつ渡して照合する MatchStream を返す
+        '''
+        if not self._compiled:
+            self.compile()
+        return MatchStream(self)
+
+    def __len__(self):
+        return len(self._patterns)
+
+
+class MatchStream:
+    '''文章を分割して渡しても、分割位置をまたいだ候補語を見つけられるようにする
+
+    offset は最初に渡した文章の先頭からの位置。
+    '''
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.state = 0
+        self.position = 0
+
+    def feed(self, text):
+        matcher = self.matcher
+        goto = matcher._goto
+        fail = matcher._fail
+        outputs = matcher._outputs
+        patterns = matcher._patterns
+        state = self.state
+        position = self.position
+        for letter in matcher._normalize(text):
+            while state and letter not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(letter, 0)
+            position += 1
+            for pattern_id in outputs[state]:
+                word, titles = patterns[pattern_id]
+                for title in titles:
+                    yield title, word, position - len(word)
+        self.state = state
+        self.position = position
@@ -0,0 +1,70 @@
+import threading
+
+
+class Metrics:
+    '''ゆらぎ候補語の作成処理の計測値を集計する
+
+    ShortenedWordBase（Yuragiなど）に metrics として渡すと、以下の値が記録される。
+    - yuragi_pattern_seconds{pattern}: 生成パターンごとの所要時間
+    - yuragi_parse_seconds{dictionary}: MeCabの解析にかかった時間
+    - yuragi_tokens_after_noise_removal: remove_noise_words 後の形態素数
+    - yuragi_candidates_before_dedup{pattern}: 重複を除く前の候補語数
+    - yuragi_candidates_after_dedup{pattern}: 重複を除いた後の候補語数
+
+    値は名前とラベルごとに、回数と合計値を集計する（Prometheusのsummaryと同じ形）。
+    callback を渡すと、記録のたびに callback(name, value, labels) が呼ばれるので、
+    statsdなど別の仕組みに送ることもできる。
+    '''
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._lock = threading.Lock()
+        # (name, ラベルのタプル) -> [回数, 合計値]
+        self._values = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._values.get(key)
+            if summary is None:
+                summary = self._values[key] = [0, 0]
+            summary[0] += 1
+            summary[1] += value
+        if self.callback is not None:
+            self.callback(name, value, labels)
+
+    def snapshot(self):
+        '''集計値を {(name, labels): (回数, 合計値)} で返す
+        '''
+        with self._lock:
+            return {key: tuple(summary) for key, summary in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def export_prometheus(self):
+        '''集計値をPrometheusのテキスト形式で返す
+        '''
+        lines = []
+        typed = set()
+        for (name, labels), (count, total) in sorted(self.snapshot().items()):
+            if name not in typed:
+                lines.append('# TYPE {0} summary'.format(name))
+                typed.add(name)
+            label_text = ','.join(
+                '{0}="{1}"'.format(key, value) for key, value in labels)
+            if label_text:
+                label_text = '{' + label_text + '}'
+            lines.append('{0}_count{1} {2}'.format(name, label_text, count))
+            lines.append('{0}_sum{1} {2}'.format(name, label_text, total))
+        return '\n'.join(lines) + '\n'
+
+    def export_statsd(self):
+        '''集計値をstatsdの行形式（平均値のgauge）で返す
+        '''
+        lines = []
+        for (name, labels), (count, total) in sorted(self.snapshot().items()):
+            metric = '.'.join([name] + [str(value) for _, value in labels])
+            lines.append('{0}:{1}|g'.format(metric, total / count))
+        return lines
@@ -0,0 +1,95 @@
+'''形態素（MeCabの解析結果の1語）の表現
+
+MeCabでデフォルト出力されるフォーマットは以下の通り。
+[表層形, 品詞, 品詞細分類1, 品詞細分類2, 品詞細分類3, 活用型, 活用形, 原形, 読み, 発音]
+via: http://taku910.github.io/mecab/#format
+
+このうち短縮語の作成で使う素性だけを Morpheme に持たせる。
+品詞と品詞細分類1は小さな整数のIDにして持つので、品詞の判定は整数の比較で済む。
+'''
+import threading
+
+# 品詞名 -> ID、ID -> 品詞名
+POS_IDS = {}
+POS_NAMES = []
+# 新しい品詞名の登録を保護するロック。複数スレッドで解析するため
+_pos_lock = threading.Lock()
+
+
+def pos_id(name: str):
+    '''品詞名（品詞細分類を含む）のIDを返す
+
+    初めて現れた品詞名には新しいIDを割り当てる。
+    登録済みの品詞名はロックを取らずに返す。
+    '''
+    pid = POS_IDS.get(name)
+    if pid is None:
+        with _pos_lock:
+            # ロックを待つ間に、他のスレッドが登録しているかもしれない
+            pid = POS_IDS.get(name)
+            if pid is None:
+                POS_NAMES.append(name)
+                pid = POS_IDS[name] = len(POS_NAMES) - 1
+    return pid
+
+
+def pos_name(pid: int):
+    return POS_NAMES[pid]
+
+
+# よく使う品詞のID
+POS_UNKNOWN = pos_id('*')
+POS_NOUN = pos_id('名詞')
+POS_PARTICLE = pos_id('助詞')
+POS_AUXILIARY_VERB = pos_id('助動詞')
+POS_SYMBOL = pos_id('記号')
+# 品詞細分類1
+POS_CASE_PARTICLE = pos_id('格助詞')
+POS_BINDING_PARTICLE = pos_id('係助詞')
+POS_PRONOUN = pos_id('代名詞')
+POS_PROPER_NOUN = pos_id('固有名詞')
+POS_SUFFIX = pos_id('接尾')
+POS_NUMBER = pos_id('数')
+POS_NON_INDEPENDENT = pos_id('非自立')
+
+
+class Morpheme:
+    '''形態素
+
+    surface: 表層形
+    pos: 品詞のID
+    pos_detail: 品詞細分類1のID
+    base: 原形
+    reading: 読み
+    pronunciation: 素性の最後の項目（通常は発音）
+        未知語は読みと発音が出力されないので、その場合は活用形などが入る。
+    '''
+    __slots__ = ('surface', 'pos', 'pos_detail', 'base', 'reading',
+                 'pronunciation')
+
+    def __init__(self, surface, pos, pos_detail, base='*', reading='',
+                 pronunciation=''):
+        self.surface = surface
+        self.pos = pos
+        self.pos_detail = pos_detail
+        self.base = base
+        self.reading = reading
+        self.pronunciation = pronunciation
+
+    @classmethod
+    def from_feature(cls, surface: str, feature: str):
+        '''表層形と、MeCabの素性（カンマ区切りの文字列）から作る
+        '''
+        fields = feature.split(',')
+        return cls(
+            surface,
+            pos_id(fields[0]),
+            pos_id(fields[1]) if len(fields) > 1 else POS_UNKNOWN,
+            fields[6] if len(fields) > 6 else '*',
+            fields[7] if len(fields) > 7 else '',
+            fields[-1])
+
+    def __repr__(self):
+        return 'Morpheme({0!r}, {1}, {2}, {3!r})'.format(
+            self.surface, pos_name(self.pos), pos_name(self.pos_detail),
+            self.pronunciation)
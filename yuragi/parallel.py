@@ -0,0 +1,91 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+import tagger
+from yuragi import Yuragi
+
+
+def _init_worker():
+    '''ワーカープロセスの起動時に辞書を読み込んでおく
+    '''
+    tagger.warm_up()
+
+
+def _generate_chunk(titles, timings=False):
+    return list(Yuragi.generate_many(
+        titles, chunk_size=len(titles), timings=timings))
+
+
+class ParallelGenerator:
+    '''複数プロセスでゆらぎ候補語を作成する
+
+    タイトルを chunk_size 件ずつに分けてワーカープロセスに渡す。
+    各ワーカーは起動時に一度だけ辞書を読み込む。
+
+    ordered=True の場合は入力と同じ順番で、
+    False の場合は処理が終わった順番で結果を返す。
+    同時に処理するチャンク数は max_pending までに抑え、
+    入力は必要になった分だけ読み込むので、大量のタイトルを渡してもメモリを圧迫しない。
+    '''
+
+    def __init__(self, max_workers=None, chunk_size=64, ordered=True,
+                 max_pending=None, timings=False):
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1: {0}'.format(chunk_size))
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_pending is None:
+            max_pending = max_workers * 2
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+        self.max_pending = max_pending
+        self.timings = timings
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, initializer=_init_worker)
+        return self._executor
+
+    def _submit_chunks(self, titles):
+        titles = iter(titles)
+        while True:
+            chunk = list(islice(titles, self.chunk_size))
+            if not chunk:
+                break
+            yield self._get_executor().submit(_generate_chunk, chunk, self.timings)
+
+    def generate(self, titles):
+        '''タイトルごとに (title, words) を yield する
+
+        words は Yuragi(title).generate() の戻り値と同じ。
+        timings=True の場合は、Yuragi.generate_many() と同じく (title, words, 秒数) を yield する。
+        '''
+        futures = self._submit_chunks(titles)
+        pending = deque(islice(futures, self.max_pending))
+        while pending:
+            if self.ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+            # 終わった分だけ次のチャンクを投入する
+            pending.extend(islice(futures, len(done)))
+            for future in done:
+                yield from future.result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,112 @@
+'''ゆらぎ候補語の生成パターンの登録簿
+
+生成パターンは、必要な入力を宣言して登録する。
+generate(patterns=[...]) で実行するパターンを選ぶと、
+選んだパターンが必要とする入力だけを作るので、
+例えば divided だけならMeCabの解析は行われない。
+
+入力の種類
+- text: 元の文字列
+- cleaned_text: サブタイトルやシリーズ番号を除去した文字列
+- features: cleaned_text をデフォルト辞書で解析した素性
+- neologd_features: cleaned_text をNEOLOGDで解析した素性
+
+新しいパターンは register_pattern で登録する。
+例：
+    @register_pattern('my_pattern', inputs=['features'])
+    def make_my_pattern(obj, features):
+        return [feature.surface for feature in features]
+'''
+TEXT = 'text'
+CLEANED_TEXT = 'cleaned_text'
+FEATURES = 'features'
+NEOLOGD_FEATURES = 'neologd_features'
+
+
+class Pattern:
+    '''生成パターン
+
+    func(obj, **inputs) はゆらぎ候補語のリストか、
+    出自（source）つきの candidates.CandidateSet を返す。
+    iterate(obj, **inputs) を渡した場合、iter_words() ではこちらを使い、
+    候補語を1つずつ作る。
+    '''
+
+    def __init__(self, name, func, inputs, iterate=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.iterate = iterate
+
+
+# パターン名 -> Pattern。登録した順番に実行する
+PATTERNS = {}
+
+
+def register_pattern(name, inputs, iterate=None):
+    '''生成パターンを登録するデコレータ
+    '''
+    def decorator(func):
+        PATTERNS[name] = Pattern(name, func, inputs, iterate)
+        return func
+    return decorator
+
+
+def get_pattern(name):
+    pattern = PATTERNS.get(name)
+    if pattern is None:
+        raise ValueError('unknown pattern: {0}'.format(name))
+    return pattern
+
+
+class PatternInputs:
+    '''パターンの入力を、必要になったときに一度だけ作る
+    '''
+
+    def __init__(self, obj):
+        self.obj = obj
+        self._values = {}
+
+    def get(self, name):
+        if name not in self._values:
+            self._values[name] = self._make(name)
+        return self._values[name]
+
+    def _make(self, name):
+        obj = self.obj
+        if name == TEXT:
+            return obj.text
+        if name == CLEANED_TEXT:
+            return obj._clean_text(obj.text)
+        if name == FEATURES:
+            return obj._get_features(self.get(CLEANED_TEXT))
+        if name == NEOLOGD_FEATURES:
+            return obj._get_features(self.get(CLEANED_TEXT), use_neologd=True)
+        raise ValueError('unknown input: {0}'.format(name))
+
+    def for_pattern(self, pattern):
+        return {name: self.get(name) for name in pattern.inputs}
+
+
+@register_pattern('divided', inputs=[TEXT])
+def make_divided(obj, text):
+    return obj._make_divided_titles(text)
+
+
+@register_pattern('unique_katakana', inputs=[FEATURES, NEOLOGD_FEATURES])
+def make_unique_katakana(obj, features, neologd_features):
+    return obj._select_unique_katakana([features, neologd_features])
+
+
+def iter_combined(obj, features):
+    return obj._iter_combination_words(features)
+
+
+@register_pattern('combined', inputs=[FEATURES], iterate=iter_combined)
+def make_combined(obj, features):
+    return obj._collect_combination_words(features)
+
+
+@register_pattern('extracted', inputs=[FEATURES])
+def make_extracted(obj, features):
+    return obj._make_extracted_words(features)
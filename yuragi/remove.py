@@ -1,5 +1,145 @@
 import re
 
+from snapshot import get_table
+from morpheme import (
+    POS_PARTICLE,
+    POS_AUXILIARY_VERB,
+    POS_SYMBOL,
+    POS_NON_INDEPENDENT
+)
+
+# 「〜」で囲われた部分（サブタイトル）
+SUBTITLE_PATTERN = re.compile('〜(.+)〜')
+# 一続きのシリーズであることを示す語
+SERIES_PATTERN = re.compile('シリーズ|series|シーズン|season', re.IGNORECASE)
+# 語の区切り
+WORD_SEPARATOR_PATTERN = re.compile('[ |\u3000]')
+
+# ノイズとみなす品詞のID
+NOISE_POS = frozenset([POS_PARTICLE, POS_AUXILIARY_VERB, POS_SYMBOL])
+
+
+class RegexRule:
+    '''テキスト全体で pattern に一致する部分を repl に置き換えるルール
+    '''
+
+    def __init__(self, pattern, repl=''):
+        self.pattern = re.compile(pattern)
+        self.repl = repl
+
+
+class WordRule:
+    '''テキストを語に区切り、pattern を含む語を取り除くルール
+
+    区切った語は最後に区切り文字なしで連結する。
+    '''
+
+    def __init__(self, pattern):
+        self.pattern = re.compile(pattern)
+
+
+class FunctionRule:
+    '''テキストを受け取ってテキストを返す関数を、そのまま適用するルール
+    '''
+
+    def __init__(self, func):
+        self.func = func
+
+
+def _join_patterns(patterns):
+    '''複数の正規表現を、いずれかに一致する1つの正規表現にまとめる
+
+    フラグはパターンの中にインラインで書いて引き継ぐ。
+    '''
+    sources = []
+    for pattern in patterns:
+        flags = ''
+        if pattern.flags & re.IGNORECASE:
+            flags = 'i'
+        if flags:
+            sources.append('(?{0}:{1})'.format(flags, pattern.pattern))
+        else:
+            sources.append('(?:{0})'.format(pattern.pattern))
+    return re.compile('|'.join(sources))
+
+
+class TextCleaner:
+    '''ルールを順番に適用して、テキストから余分な文字列を取り除く
+
+    ルールは作成時に一度だけ組み立てる。
+    置き換え先が同じ RegexRule が続く場合と、WordRule が続く場合は
+    1つの正規表現にまとめるので、ルールが増えてもテキストの走査回数は増えない。
+    stages に dump_stages() の戻り値を渡すと、ルールをまとめる処理を省略する。
+    '''
+
+    def __init__(self, rules, stages=None):
+        self.rules = list(rules)
+        if stages is None:
+            self._stages = self._compile(self.rules)
+        else:
+            self._stages = self._load_stages(stages)
+
+    def _compile(self, rules):
+        stages = []
+        for rule in rules:
+            last = stages[-1] if stages else None
+            if isinstance(rule, RegexRule):
+                if last is not None and last[0] == 'regex' and last[2] == rule.repl:
+                    last[1].append(rule.pattern)
+                else:
+                    stages.append(['regex', [rule.pattern], rule.repl])
+            elif isinstance(rule, WordRule):
+                if last is not None and last[0] == 'word':
+                    last[1].append(rule.pattern)
+                else:
+                    stages.append(['word', [rule.pattern], None])
+            elif isinstance(rule, FunctionRule):
+                stages.append(['function', rule.func, None])
+            else:
+                raise TypeError('unknown rule: {0!r}'.format(rule))
+        compiled = []
+        for kind, value, repl in stages:
+            if kind != 'function':
+                value = value[0] if len(value) == 1 else _join_patterns(value)
+            compiled.append((kind, value, repl))
+        return compiled
+
+    def dump_stages(self):
+        '''まとめたルールを、保存できる値（文字列と数値）のリストで返す
+
+        関数は名前で保存するので、同じ rules を渡した TextCleaner でしか復元できない。
+        '''
+        stages = []
+        for kind, value, repl in self._stages:
+            if kind == 'function':
+                stages.append((kind, value.__name__, 0, None))
+            else:
+                stages.append((kind, value.pattern, value.flags, repl))
+        return stages
+
+    def _load_stages(self, stages):
+        functions = {rule.func.__name__: rule.func
+                     for rule in self.rules if isinstance(rule, FunctionRule)}
+        compiled = []
+        for kind, value, flags, repl in stages:
+            if kind == 'function':
+                compiled.append((kind, functions[value], None))
+            else:
+                compiled.append((kind, re.compile(value, flags), repl))
+        return compiled
+
+    def clean(self, text: str):
+        for kind, value, repl in self._stages:
+            if kind == 'regex':
+                text = value.sub(repl, text)
+            elif kind == 'word':
+                search = value.search
+                words = WORD_SEPARATOR_PATTERN.split(text)
+                text = ''.join([word for word in words if not search(word)])
+            else:
+                text = value(text)
+        return text
+
 
 def remove_subtitle(text: str):
     '''サブタイトルを削除した、文字列を返す
@@ -7,7 +147,7 @@ def remove_subtitle(text: str):
     「〜」で囲われた部分をサブタイトルと見なす
     ほかにもサブタイトルと判定できそうなルールが見つかったら、鋭意追加していく
     '''
-    return re.sub('〜(.+)〜', '', text)
+    return SUBTITLE_PATTERN.sub('', text)
 
 
 def remove_series(text: str):
@@ -21,11 +161,8 @@ def remove_series(text: str):
     - 「season」
     ほかにもシリーズ番号と判定できそうなルールが見つかったら、鋭意追加していく
     '''
-    words = re.split('[\ |\u3000]', text)
-    for word in words:
-        if re.search('シリーズ|series|シーズン|season', word.lower()):
-            words.remove(word)
-    return ''.join(words)
+    words = WORD_SEPARATOR_PATTERN.split(text)
+    return ''.join([word for word in words if not SERIES_PATTERN.search(word)])
 
 
 def remove_person_name(text: str):
@@ -52,6 +189,26 @@ def remove_catchcopy(text: str):
     return text
 
 
+# ShortenedWordBase._clean_text で使うルール
+# 上から順番に適用される
+CLEANING_RULES = [
+    RegexRule(SUBTITLE_PATTERN),
+    WordRule(SERIES_PATTERN),
+    FunctionRule(remove_person_name),
+    FunctionRule(remove_version_number),
+    FunctionRule(remove_catchcopy),
+]
+
+# スナップショットがあれば、まとめたルールはそれを使う
+default_cleaner = TextCleaner(CLEANING_RULES, get_table('cleaning_stages'))
+
+
+def clean_text(text: str):
+    '''CLEANING_RULES を適用した、文字列を返す
+    '''
+    return default_cleaner.clean(text)
+
+
 def remove_noise_words(features: list) -> list:
     '''ノイズと思われる語を削除した、リストを返す
 
@@ -64,9 +221,6 @@ def remove_noise_words(features: list) -> list:
     - 非自立動詞（ごらん、ちょうだい、しまう、ちゃう）
     など。
     '''
-    cleaned_features = []
-    for index, features in enumerate(features):
-        if not re.search('助詞|助動詞|記号', features[1]) and \
-                not features[2] == '非自立':  # 名詞と動詞の非自立
-            cleaned_features.append(features)
-    return cleaned_features
+    return [feature for feature in features
+            if feature.pos not in NOISE_POS and  # 助詞、助動詞、記号
+            feature.pos_detail != POS_NON_INDEPENDENT]  # 名詞と動詞の非自立
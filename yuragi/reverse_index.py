@@ -0,0 +1,276 @@
+'''ゆらぎ候補語から元のタイトルを引くための逆引きインデックス
+
+SNSなどで見つけた語が、どの番組を指しているかを調べるのに使う。
+候補語は正規化（ひらがな -> カタカナ、英字は小文字）した形と、
+カナだけの候補語はローマ字にした形でも登録するので、
+「てんすら」「テンスラ」「tensura」のどれでも「転生したらスライムだった件」が引ける。
+
+インデックスはファイルに保存でき、MappedReverseIndex で読み込めば
+ファイルをメモリマップして二分探索するので、起動時に全体を読み込まずに済む。
+'''
+import mmap
+import struct
+from bisect import bisect_left, insort
+
+from charclass import KATAKANA, script_of
+from utils import HIRA2KATA_TABLE, kana2romaji
+
+MAGIC = b'YRGI'
+FORMAT_VERSION = 1
+# magic, バージョン, タイトル数, キー数
+HEADER = struct.Struct('<4sIII')
+OFFSET = struct.Struct('<Q')
+TITLE_ID = struct.Struct('<I')
+
+
+def normalize_key(word: str):
+    '''検索用に語を正規化する
+    '''
+    return word.translate(HIRA2KATA_TABLE).lower()
+
+
+def candidate_keys(word: str):
+    '''候補語を登録するキーの集合を返す
+    '''
+    key = normalize_key(word)
+    keys = {key}
+    if script_of(key) == KATAKANA:
+        romaji = kana2romaji(key)
+        if romaji:
+            keys.add(romaji)
+    return keys
+
+
+def _prefix_end(prefix):
+    '''prefix で始まる文字列より大きい、最小の文字列を返す
+    '''
+    return prefix + '\U0010ffff'
+
+
+class ReverseIndex:
+    '''候補語 -> タイトルの集合 の逆引きインデックス
+
+    add_title / remove_title でタイトルを1件ずつ追加・削除できる。
+    '''
+
+    def __init__(self):
+        # キー -> タイトルの集合
+        self._postings = {}
+        # タイトル -> 登録したキーの集合（削除用）
+        self._title_keys = {}
+        # 前方一致検索用のソート済みキー。最初の lookup_prefix() で作り、
+        # その後はキーの追加・削除に合わせてその場で更新する
+        self._sorted_keys = None
+
+    def add_title(self, title, words):
+        '''タイトルと、そのゆらぎ候補語（get_words() の戻り値など）を登録する
+
+        登録済みのタイトルは、候補語を置き換える。
+        '''
+        if title in self._title_keys:
+            self.remove_title(title)
+        keys = set()
+        for word in words:
+            keys |= candidate_keys(word)
+        for key in keys:
+            titles = self._postings.get(key)
+            if titles is None:
+                titles = self._postings[key] = set()
+                if self._sorted_keys is not None:
+                    insort(self._sorted_keys, key)
+            titles.add(title)
+        self._title_keys[title] = keys
+
+    def add_yuragi(self, yuragi):
+        '''generate() 済みの Yuragi を登録する
+        '''
+        self.add_title(yuragi.text, yuragi.get_words())
+
+    def remove_title(self, title):
+        keys = self._title_keys.pop(title, ())
+        for key in keys:
+            titles = self._postings[key]
+            titles.discard(title)
+            if not titles:
+                del self._postings[key]
+                if self._sorted_keys is not None:
+                    del self._sorted_keys[bisect_left(self._sorted_keys, key)]
+
+    def lookup(self, word):
+        '''word に一致する候補語を持つタイトルの集合を返す
+        '''
+        return set(self._postings.get(normalize_key(word), ()))
+
+    def lookup_prefix(self, prefix, limit=None):
+        '''prefix で始まる候補語を持つタイトルの集合を返す
+
+        limit を指定した場合は、limit 件のキーを調べたところで打ち切る。
+        '''
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self._postings)
+        prefix = normalize_key(prefix)
+        keys = self._sorted_keys
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, _prefix_end(prefix))
+        if limit is not None:
+            end = min(end, start + limit)
+        result = set()
+        for key in keys[start:end]:
+            result |= self._postings[key]
+        return result
+
+    def __len__(self):
+        return len(self._title_keys)
+
+    def __contains__(self, title):
+        return title in self._title_keys
+
+    def save(self, path):
+        '''メモリマップして読み込める形式でファイルに保存する
+
+        ファイルの構成（数値はリトルエンディアン）
+        - ヘッダ: magic, バージョン, タイトル数, キー数
+        - タイトルのオフセット表（タイトル数+1件）
+        - キーのオフセット表（キー数+1件）
+        - 各キーのタイトルIDのオフセット表（キー数+1件）
+        - タイトル（UTF-8を連結したもの）
+        - キー（UTF-8のバイト順にソートして連結したもの）
+        - タイトルID（uint32）
+        オフセットはそれぞれの領域の先頭からの位置。
+        '''
+        titles = sorted(self._title_keys)
+        title_ids = {title: i for i, title in enumerate(titles)}
+        encoded_keys = sorted(
+            (key.encode('utf-8'), key) for key in self._postings)
+
+        title_blob = bytearray()
+        title_offsets = [0]
+        for title in titles:
+            title_blob += title.encode('utf-8')
+            title_offsets.append(len(title_blob))
+        key_blob = bytearray()
+        key_offsets = [0]
+        postings = bytearray()
+        posting_offsets = [0]
+        for encoded, key in encoded_keys:
+            key_blob += encoded
+            key_offsets.append(len(key_blob))
+            for title_id in sorted(title_ids[title] for title in self._postings[key]):
+                postings += TITLE_ID.pack(title_id)
+            posting_offsets.append(len(postings) // TITLE_ID.size)
+
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(titles), len(encoded_keys)))
+            for offsets in (title_offsets, key_offsets, posting_offsets):
+                f.write(struct.pack('<{0}Q'.format(len(offsets)), *offsets))
+            f.write(title_blob)
+            f.write(key_blob)
+            f.write(postings)
+
+    @classmethod
+    def load(cls, path):
+        '''保存したファイルから、変更できるインデックスを作る
+        '''
+        index = cls()
+        with MappedReverseIndex(path) as mapped:
+            for title, keys in mapped.iter_title_keys():
+                index._title_keys[title] = keys
+                for key in keys:
+                    index._postings.setdefault(key, set()).add(title)
+        return index
+
+
+class MappedReverseIndex:
+    '''保存したインデックスを、メモリマップして読み込む
+
+    読み込み専用。キーの二分探索とタイトルの取り出しはファイルの上で直接行う。
+    '''
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.title_count, self.key_count = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('not a yuragi reverse index: {0}'.format(path))
+        position = HEADER.size
+        self._title_offsets = position
+        position += (self.title_count + 1) * OFFSET.size
+        self._key_offsets = position
+        position += (self.key_count + 1) * OFFSET.size
+        self._posting_offsets = position
+        position += (self.key_count + 1) * OFFSET.size
+        self._titles = position
+        self._keys = self._titles + self._offset(self._title_offsets, self.title_count)
+        self._postings = self._keys + self._offset(self._key_offsets, self.key_count)
+
+    def _offset(self, table, i):
+        return OFFSET.unpack_from(self._mmap, table + i * OFFSET.size)[0]
+
+    def _key(self, i):
+        start = self._keys + self._offset(self._key_offsets, i)
+        end = self._keys + self._offset(self._key_offsets, i + 1)
+        return self._mmap[start:end]
+
+    def _title(self, title_id):
+        start = self._titles + self._offset(self._title_offsets, title_id)
+        end = self._titles + self._offset(self._title_offsets, title_id + 1)
+        return self._mmap[start:end].decode('utf-8')
+
+    def _title_ids(self, i):
+        start = self._offset(self._posting_offsets, i)
+        end = self._offset(self._posting_offsets, i + 1)
+        for n in range(start, end):
+            yield TITLE_ID.unpack_from(
+                self._mmap, self._postings + n * TITLE_ID.size)[0]
+
+    def _bisect(self, encoded):
+        low, high = 0, self.key_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, word):
+        encoded = normalize_key(word).encode('utf-8')
+        i = self._bisect(encoded)
+        if i < self.key_count and self._key(i) == encoded:
+            return {self._title(title_id) for title_id in self._title_ids(i)}
+        return set()
+
+    def lookup_prefix(self, prefix, limit=None):
+        encoded = normalize_key(prefix).encode('utf-8')
+        i = self._bisect(encoded)
+        title_ids = set()
+        checked = 0
+        while i < self.key_count and self._key(i).startswith(encoded):
+            if limit is not None and checked >= limit:
+                break
+            title_ids.update(self._title_ids(i))
+            checked += 1
+            i += 1
+        return {self._title(title_id) for title_id in title_ids}
+
+    def iter_title_keys(self):
+        '''(タイトル, キーの集合) を1つずつ返す
+        '''
+        keys = {}
+        for i in range(self.key_count):
+            key = self._key(i).decode('utf-8')
+            for title_id in self._title_ids(i):
+                keys.setdefault(title_id, set()).add(key)
+        for title_id in range(self.title_count):
+            yield self._title(title_id), keys.get(title_id, set())
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,56 +1,187 @@
+import heapq
 import re
-import MeCab
-import jaconv
-
-import utils
+import time
+from collections import Counter
+from difflib import SequenceMatcher
+from functools import partial
+from itertools import islice
+
+from charclass import KATAKANA, script_of
+from lazy import lazy_import
+from variant_cache import variant_cache as default_variant_cache
+from tagger import get_tagger_options, parse_features
+from feature_cache import normalize_text
+from morpheme import POS_NOUN
+from extract import (
+    extract_subject,
+    extract_pronouns,
+    extract_proper_nouns,
+    extract_suffix,
+    extract_number
+)
+from candidates import CandidateSet
+from bulk import token_key
+from patterns import PatternInputs, get_pattern
 from remove import (
-    remove_subtitle,
-    remove_series,
+    clean_text,
     remove_noise_words
 )
-from settings import NEOLOGD_PATH
+
+jaconv = lazy_import('jaconv')
+
+
+def score_combination(feature_a, index_a, feature_b, index_b):
+    '''結合語のもとになる2単語の組み合わせのスコアを返す
+
+    feature_a, feature_b は Morpheme、index_a, index_b はノイズ除去後の位置。
+    スコアが高いほど短縮語として用いられやすいと考える。
+    - 2単語が隣り合っているほど高い
+    - 単語Aがタイトルの先頭に近いほど高い
+    - 名詞は高い
+    '''
+    score = 1.0 / (index_b - index_a)
+    score += 1.0 / (index_a + 1)
+    for feature in (feature_a, feature_b):
+        if feature.pos == POS_NOUN:
+            score += 0.5
+    return score
 
 
 class ShortenedWordBase:
     text = ''
-    words = {}
-    features = {}
-
-    def __init__(self, text, *args, **kwargs):
+    _words = {}
+    # self._words から作った候補語の集合。self.words が置き換えられたら作り直す
+    _candidates = None
+    # 複数インスタンスで共有する素性のキャッシュ（FeatureCache）
+    # None の場合はインスタンス内でのみ素性を使い回す
+    feature_cache = None
+    # 計測値の記録先（metrics.Metrics）
+    # None の場合は何も計測しない
+    metrics = None
+    # generate() で実行する生成パターンの名前（patterns.PATTERNS に登録したもの）
+    default_patterns = ()
+    # このクラスで実行できる生成パターンの名前
+    # パターンはクラスのメソッドを呼ぶので、メソッドを持つクラスでしか実行できない
+    supported_patterns = ()
+    # 形態素ごとの変換結果のキャッシュ（variant_cache.VariantCache）
+    # デフォルトではプロセス全体で共有する。None の場合はキャッシュしない
+    variant_cache = default_variant_cache
+    # ゆらぎ候補語のキャッシュ（candidate_cache.CandidateCache）
+    # None の場合は毎回ゆらぎ候補語を作成する
+    candidate_cache = None
+
+    def __init__(self, text, *args, feature_cache=None, metrics=None,
+                 candidate_cache=None, **kwargs):
         self.text = text
-        self.features = self._get_features(text)
+        if feature_cache is not None:
+            self.feature_cache = feature_cache
+        if metrics is not None:
+            self.metrics = metrics
+        if candidate_cache is not None:
+            self.candidate_cache = candidate_cache
+        # (正規化したテキスト, MeCabのオプション) をキーにした解析済みの素性
+        self._features_memo = {}
+
+    @property
+    def words(self):
+        '''生成パターン名をキーにした、ゆらぎ候補語のリストのdict
+        '''
+        return self._words
+
+    @words.setter
+    def words(self, words):
+        self._words = words
+        self._candidates = None
+
+    @property
+    def candidates(self):
+        '''ゆらぎ候補語の集合（CandidateSet）
+
+        生成パターンと、結合語なら組み合わせた形態素の位置を出自として持つ。
+        '''
+        if self._candidates is None:
+            self._candidates = CandidateSet.from_pattern_words(
+                self._words, title=self.text)
+        return self._candidates
+
+    @property
+    def features(self):
+        '''元の文字列の素性
+
+        初めて参照されたときに解析する。
+        '''
+        return self._get_features(self.text)
+
+    def _cache_variant(self):
+        '''candidate_cache に渡す、生成オプションを表す文字列を返す
+
+        None を返した場合は、結果をキャッシュしない。
+        '''
+        return type(self).__name__
 
     def _clean_text(self, text):
         '''textをから余分な文字列を削除する
         '''
-        text = remove_subtitle(text)
-        text = remove_series(text)
-        return text
+        return clean_text(text)
 
     def _get_features(self, text, use_neologd=False):
         ''' 素性を取得する
 
-        MeCabでデフォルト出力されるフォーマットは以下の通り。
-        [表層形, 品詞, 品詞細分類1, 品詞細分類2, 品詞細分類3, 活用型, 活用形, 原形, 読み, 発音]
-        via: http://taku910.github.io/mecab/#format
+        素性は形態素ごとの Morpheme のリストで返す。
+        同じテキスト・辞書の組み合わせは一度だけ解析し、以降は解析済みの素性を返す。
+        返ってきた素性は共有されているので、書き換えないこと。
         '''
-        if use_neologd:
-            tagger = MeCab.Tagger(' --dicdir {0}'.format(NEOLOGD_PATH))
-        else:
-            tagger = MeCab.Tagger()
-        results = tagger.parse(text).split('\n')
-        features = []
-        for result in results:
-            result = result.split('\t')
-            if len(result) > 1:  # EOSと空白は何もしない
-                original_word = result[0]
-                word_features = result[1].split(',')
-                tmp = []
-                tmp.append(original_word)
-                tmp.extend(word_features)
-                features.append(tmp)
+        key = (normalize_text(text), get_tagger_options(use_neologd))
+        features = self._features_memo.get(key)
+        if features is not None:
+            return features
+        if self.feature_cache is not None:
+            features = self.feature_cache.get(key)
+        if features is None:
+            if self.metrics is None:
+                features = parse_features(key[0], use_neologd=use_neologd)
+            else:
+                start = time.perf_counter()
+                features = parse_features(key[0], use_neologd=use_neologd)
+                self.metrics.observe(
+                    'yuragi_parse_seconds', time.perf_counter() - start,
+                    dictionary='neologd' if use_neologd else 'default')
+            if self.feature_cache is not None:
+                self.feature_cache.set(key, features)
+        self._features_memo[key] = features
         return features
 
+    def _run_pattern(self, pattern_name, func, *args, **kwargs):
+        '''生成パターンを実行する
+
+        metrics が設定されている場合は、所要時間を記録する。
+        候補語数は重複を除いてから _observe_candidates() で記録する。
+        '''
+        if self.metrics is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        words = func(*args, **kwargs)
+        self.metrics.observe(
+            'yuragi_pattern_seconds', time.perf_counter() - start,
+            pattern=pattern_name)
+        return words
+
+    def _observe_candidates(self, candidates, pattern_counts):
+        '''metrics が設定されている場合は、作成した候補語数を記録する
+
+        pattern_counts はパターン名 -> 重複を除いた候補語数のdict。
+        全パターンの分は pattern='all' として記録する。
+        '''
+        if self.metrics is None:
+            return
+        for pattern_name, count in pattern_counts.items():
+            self.metrics.observe(
+                'yuragi_candidates_after_dedup', count, pattern=pattern_name)
+        self.metrics.observe(
+            'yuragi_candidates_before_dedup', candidates.added_count, pattern='all')
+        self.metrics.observe(
+            'yuragi_candidates_after_dedup', len(candidates), pattern='all')
+
     def _filter_gt_3chars(self, words: list):
         '''
         語のリストから3字以上の語リストを返す
@@ -69,6 +200,71 @@ class ShortenedWordBase:
                 cleaned_words.append(word)
         return cleaned_words
 
+    def _resolve_patterns(self, patterns=None):
+        '''パターン名のリストから Pattern のリストを返す
+
+        patterns が None の場合は default_patterns を使う。
+        supported_patterns に無いパターンは、登録されていても ValueError になる。
+        '''
+        if patterns is None:
+            patterns = self.default_patterns
+        for name in patterns:
+            if name not in self.supported_patterns:
+                raise ValueError('unknown pattern: {0}'.format(name))
+        return [get_pattern(name) for name in patterns]
+
+    def _iter_patterns(self, patterns=None):
+        '''(生成パターン名, ゆらぎ候補語のiterable) を1つずつ返す
+
+        各パターンの候補語は、そのパターンが取り出された時点で作り始める。
+        '''
+        inputs = PatternInputs(self)
+        for pattern in self._resolve_patterns(patterns):
+            func = pattern.iterate or pattern.func
+            yield pattern.name, func(self, **inputs.for_pattern(pattern))
+
+    def iter_words(self, patterns=None):
+        '''ゆらぎ候補語を1つずつ返す
+
+        generate() と違い、各パターンは候補語が必要になった時点で実行されるので、
+        途中で止めれば残りのパターンは実行されない。
+        重複する候補語は返さない。self.words には何も格納しない。
+        '''
+        seen = set()
+        for pattern_name, words in self._iter_patterns(patterns):
+            for word in words:
+                if word not in seen:
+                    seen.add(word)
+                    yield word
+
+    def generate(self, patterns=None):
+        '''ゆらぎ候補語を作成する
+
+        patterns にパターン名のリストを渡すと、そのパターンだけを実行する。
+        省略した場合は default_patterns を実行する。
+        パターンに必要な入力（除去後の文字列や素性）だけを作るので、
+        MeCabを使わないパターンだけなら解析は行われない。
+        '''
+        words = {}
+        counts = {}
+        candidates = CandidateSet(title=self.text)
+        inputs = PatternInputs(self)
+        for pattern in self._resolve_patterns(patterns):
+            result = self._run_pattern(
+                pattern.name, pattern.func, self, **inputs.for_pattern(pattern))
+            if isinstance(result, CandidateSet):
+                # 出自つきで作るパターン。候補語はコピーせずに共有する
+                candidates.merge(result)
+                words[pattern.name] = result.words()
+                counts[pattern.name] = len(result)
+            else:
+                counts[pattern.name] = candidates.update(result, pattern.name)
+                words[pattern.name] = result
+        self.words = words
+        self._candidates = candidates
+        self._observe_candidates(candidates, counts)
+        return self.words
+
     def get_words(self, debug=False):
         '''ゆらぎ候補語を取得する処理
 
@@ -81,26 +277,31 @@ class ShortenedWordBase:
         self.generate() を実行すると、self.words にゆらぎ候補語が格納されるが、
         実行前は空のdictになっている。
         空のdictが返って来る場合は、 self.generate() を実行すると良いかもしれない。
+        候補語は作られた順番に並ぶ。
         '''
         if debug is True:
             return self.words
-        result = []
-        for pattern_name, word_list in self.words.items():
-            if word_list is not None:
-                result.extend(word_list)
-        return list(set(result))
+        return self.candidates.words()
 
 
 class SingleShortenedWord(ShortenedWordBase):
     '''単一の語から成り立つ短縮語
     '''
+    default_patterns = ('divided', 'unique_katakana')
+    supported_patterns = ('divided', 'unique_katakana', 'extracted')
 
-    def _make_extracted_words(self):
+    def _make_extracted_words(self, features: list):
         '''抽出した語をそのままゆらぎ候補語として取り出す
 
-        TODO 必要あれば実装する
+        主語、代名詞、固有名詞、接尾語、数字を取り出す。
         '''
-        pass
+        words = []
+        words.extend(extract_subject(features))
+        words.extend(extract_pronouns(features))
+        words.extend(extract_proper_nouns(features))
+        words.extend(extract_suffix(features))
+        words.extend(extract_number(features))
+        return words
 
     def _make_divided_titles(self, text):
         '''分割した語をそのままゆらぎ候補語として取り出す
@@ -131,13 +332,14 @@ class SingleShortenedWord(ShortenedWordBase):
         短縮語として用いられないことが多いように思われる。
         '''
         words = []
+        variant_cache = self.variant_cache
         for feature in features:
-            is_katakana = True
-            for letter in feature[0]:
-                if not utils.is_katakana(letter):
-                    is_katakana = False
-            if is_katakana:
-                words.append(feature[0])
+            if variant_cache is None:
+                script = script_of(feature.surface)
+            else:
+                script = variant_cache.get(feature).script
+            if script == KATAKANA:
+                words.append(feature.surface)
         # カタカナ語がない場合、2つ以上あった場合は何も返さない
         return words
         if len(words) == 1:
@@ -151,31 +353,65 @@ class SingleShortenedWord(ShortenedWordBase):
         NEOLOGDを有効にした場合と、無効にした場合の
         2パターンの形態素セットでカタカナ語を作成する。
         '''
-        result = []
         features = self._get_features(text, use_neologd=False)
         features_neologd = self._get_features(text, use_neologd=True)
-        for f in [features, features_neologd]:
+        return self._select_unique_katakana([features, features_neologd])
+
+    def _select_unique_katakana(self, features_sets: list):
+        '''形態素セットごとに、カタカナ語が1つだけの場合はそれを取り出す
+        '''
+        result = []
+        for f in features_sets:
             katakana_list = self._extract_katakana(f)
             if len(katakana_list) == 1:
                 result.extend(katakana_list)
         return result
 
-    def generate(self):
-        words = {}
-
-        # サブタイトルとシリーズ番号を除去
-        cleaned_text = self._clean_text(self.text)
-
-        # wordsに追加する
-        words['divided'] = self._make_divided_titles(self.text)
-        words['unique_katakana'] = self._make_unique_katakana(cleaned_text)
-        self.words = words
-        return self.words
-
 
 class CombinedShortenedWord(ShortenedWordBase):
     '''複数の語を組み合わせて成立する短縮語
     '''
+    default_patterns = ('combined',)
+    supported_patterns = ('combined',)
+    # 結合語の候補語数の上限。None の場合は総当たりで全ての結合語を作る
+    max_candidates = None
+    # 結合語のもとになる2単語の組み合わせのスコア関数
+    # None の場合は score_combination を使う
+    combination_score = None
+    # regenerate() で使う、結合語を作ったときの状態
+    # (ノイズ除去後の形態素の token_key, 短縮語の素, 結合語ごとの作られた回数)
+    _combination_state = None
+    # 短縮語の素を一括で作っておいた bulk.TokenColumns。generate_many() が設定する
+    token_columns = None
+    # token_columns でのこのタイトルの番号。generate_many() が設定する
+    token_index = None
+
+    def __init__(self, text, *args, max_candidates=None, combination_score=None,
+                 token_columns=None, **kwargs):
+        if max_candidates is not None:
+            self.max_candidates = max_candidates
+        if combination_score is not None:
+            self.combination_score = combination_score
+        if token_columns is not None:
+            self.token_columns = token_columns
+        super().__init__(text, *args, **kwargs)
+
+    def _cache_variant(self):
+        variant = super()._cache_variant()
+        if variant is None:
+            return None
+        variant = '{0}:{1}'.format(variant, self.max_candidates)
+        score = self.combination_score
+        if self.max_candidates is None or score is None:
+            return variant
+        # スコア関数は、モジュールと名前で区別する
+        module = getattr(score, '__module__', None)
+        qualname = getattr(score, '__qualname__', None)
+        if module is None or qualname is None or '<' in qualname:
+            # lambda や関数の中で定義した関数は名前で区別できないので、キャッシュしない
+            return None
+        return '{0}:{1}.{2}'.format(variant, module, qualname)
+
     def _remove_noise_from_tokens(self):
         '''形態素から、助詞や助動詞や記号など
         短縮語として用いられる可能性の低い語を除去する
@@ -192,6 +428,35 @@ class CombinedShortenedWord(ShortenedWordBase):
                 words.append(wa + wb)
         return words
 
+    def _make_acronym_parts(self, features: list):
+        '''素性から短縮語の素になる二次元配列を作る
+
+        短縮語として用いられそうな語を、
+        表層形2字、表層形1字、カタカナ2字、ひらがな2字の4種類ずつの
+        配列を作る
+
+        例：「ボク、運命の人です」の場合
+        [['ボク', 'ボ', 'ボク', 'ぼく']
+         ['運命', '運', 'ウン', 'うん']
+         ['人', '人', 'ヒト', 'ひと']]
+
+        token_columns が設定されている場合は一括で作っておいたものを、
+        variant_cache が設定されている場合はキャッシュしたものを使う。
+        '''
+        if self.token_columns is not None:
+            return self.token_columns.parts_for(features)
+        if self.variant_cache is not None:
+            get = self.variant_cache.get
+            return [get(feature).parts for feature in features]
+        words_a = []
+        for i, feature in enumerate(features):
+            words_a.append([])
+            words_a[i].append(feature.surface[:2])  # 表層形2字
+            words_a[i].append(feature.surface[:1])  # 表層形1字
+            words_a[i].append(feature.pronunciation[:2])  # カタカナ2字
+            words_a[i].append(jaconv.kata2hira(feature.pronunciation[:2]))  # ひらがな2字
+        return words_a
+
     def _make_acronym_combination_words(self, features_list: list):
         '''2単語の頭文字の組み合わせで構成される、ゆらぎ候補語を作り、リストで返す
 
@@ -202,50 +467,222 @@ class CombinedShortenedWord(ShortenedWordBase):
 
         ある語を、表層形2字、表層形1字、カタカナ2字、ひらがな2字の4パターンがあると想定し、
         2単語 * 4パターン の短縮語を作成する。
+
+        max_candidates が設定されている場合は、スコアの高い順に
+        max_candidates 件までの候補語を返す。
+        '''
+        return self._collect_combination_words(features_list).words()
+
+    def _collect_combination_words(self, features_list: list):
+        '''結合語のゆらぎ候補語を、組み合わせた形態素の位置と一緒に CandidateSet で返す
+
+        形態素の位置は、ノイズ除去後の位置。
+        '''
+        candidates = CandidateSet(title=self.text)
+        if self.max_candidates is not None:
+            pairs = list(islice(
+                self._iter_ranked_combination_pairs(features_list),
+                self.max_candidates))
+            # ランキングで取り出した候補語は重複しない
+            sources = {word: pair for pair, word in pairs}
+            candidates.update(sources, 'combined', sources=sources)
+            return candidates
+
+        if self.token_columns is not None and self.token_index is not None:
+            # generate_many() でノイズ除去と短縮語の素の作成は済んでいる
+            keys = self.token_columns.title_token_keys(self.token_index)
+            parts = self.token_columns.title_parts(self.token_index)
+        else:
+            features = remove_noise_words(features_list)
+            keys = list(map(token_key, features))
+            parts = self._make_acronym_parts(features)
+        if self.metrics is not None:
+            self.metrics.observe('yuragi_tokens_after_noise_removal', len(parts))
+        counter = self._count_acronym_combination_words(parts)
+        if self.metrics is not None:
+            self.metrics.observe(
+                'yuragi_candidates_before_dedup', sum(counter.values()),
+                pattern='combined')
+        # regenerate() では、この状態から変わった組み合わせの分だけを数え直す
+        self._combination_state = (keys, parts, counter)
+        return self._combination_candidates(parts, counter)
+
+    def _combination_candidates(self, parts: list, counter):
+        '''結合語ごとの作られた回数から、結合語の CandidateSet を作る
+
+        結合語は文字列の順に並べるので、regenerate() で差分から作り直したときも
+        generate() と同じ順番になる。
+        組み合わせた形態素の位置は、出自が必要になったときに作る。
+        '''
+        candidates = CandidateSet(title=self.text)
+        candidates.update(dict.fromkeys(sorted(counter)), 'combined',
+                          sources=partial(self._combination_sources, parts),
+                          count=sum(counter.values()))
+        return candidates
+
+    def _count_acronym_combination_words(self, parts: list):
+        '''短縮語の素を総当たりで組み合わせた結合語を、作られた回数と一緒に数える
+        '''
+        words = []
+        for i, word_a in enumerate(parts):
+            for j in range(i + 1, len(parts)):
+                words.extend(self._reflex(word_a, parts[j]))
+        return Counter(words)
+
+    def _combination_sources(self, parts: list):
+        '''結合語 -> 最初に作られたときの (単語Aの位置, 単語Bの位置) のdictを返す
+        '''
+        sources = {}
+        for i, word_a in enumerate(parts):
+            for j in range(i + 1, len(parts)):
+                for word in self._reflex(word_a, parts[j]):
+                    if word not in sources:
+                        sources[word] = (i, j)
+        return sources
+
+    def _iter_acronym_combination_words(self, features_list: list):
+        '''2単語の頭文字の組み合わせで構成される結合語を、重複を除かずに1つずつ返す
+        '''
+        for _, word in self._iter_acronym_combination_pairs(features_list):
+            yield word
+
+    def _iter_acronym_combination_pairs(self, features_list: list):
+        '''2単語の頭文字の組み合わせで構成される結合語を、
+        ((単語Aの位置, 単語Bの位置), 結合語) で重複を除かずに1つずつ返す
         '''
         # 素性から助詞や助動詞など不要なワードを除去する
         features = remove_noise_words(features_list)
+        if self.metrics is not None:
+            self.metrics.observe('yuragi_tokens_after_noise_removal', len(features))
 
         # 素性から短縮語の素になる二次元配列を作る
-        # 短縮語として用いられそうな語を、
-        # 表層形2字、表層形1字、カタカナ2字、ひらがな2字の4種類ずつの
-        # 配列を作る
-        #
-        # 例：「ボク、運命の人です」の場合
-        # [['ボク', 'ボ', 'ボク', 'ぼく']
-        #  ['運命', '運', 'ウン', 'うん']
-        #  ['人', '人', 'ヒト', 'ひと']]
-        words_a = []
-        for i, feature in enumerate(features):
-            words_a.append([])
-            words_a[i].append(feature[0][:2])  # 表層形2字
-            words_a[i].append(feature[0][:1])  # 表層形1字
-            words_a[i].append(feature[-1][:2])  # カタカナ2字
-            words_a[i].append(jaconv.kata2hira(feature[-1][:2]))  # ひらがな2字
+        words_a = self._make_acronym_parts(features)
 
         # 短縮語の素を組み合わせて、結合語を作る
-        # 総当たりで組み合わせた語のリストを作る
+        # 総当たりで組み合わせる
         # 単語Aが単語Bよりも先にくるもののみ作成する
         words_b = words_a
-        combined_words = []
         for i, word_a in enumerate(words_a):
             for j, word_b in enumerate(words_b):
                 if i < j:
-                    combined_words.extend(self._reflex(word_a, word_b))
+                    for word in self._reflex(word_a, word_b):
+                        yield (i, j), word
 
-        # 重複をなくしてリストで返す
-        return list(set(combined_words))
+    def _iter_combination_words(self, features_list: list):
+        '''結合語のゆらぎ候補語を1つずつ返す
 
-    def generate(self):
-        words = {}
+        max_candidates が設定されている場合は、スコアの高い順に
+        max_candidates 件まで返す。
+        '''
+        if self.max_candidates is not None:
+            return islice(
+                self.iter_ranked_combination_words(features_list),
+                self.max_candidates)
+        return self._iter_acronym_combination_words(features_list)
 
-        # サブタイトルとシリーズ番号を除去
-        cleaned_text = self._clean_text(self.text)
+    def _count_combination_words(self, cleaned_text):
+        '''結合語を、作られた回数と一緒に数える
 
-        # 素性に分解する
-        features = self._get_features(cleaned_text)
+        regenerate() で差分を計算するための状態を返す。
+        '''
+        features = remove_noise_words(self._get_features(cleaned_text))
+        parts = self._make_acronym_parts(features)
+        return (list(map(token_key, features)), parts,
+                self._count_acronym_combination_words(parts))
 
-        # wordsに追加する
-        words['combined'] = self._make_acronym_combination_words(features)
-        self.words = words
-        return self.words
+    def _update_combination_words(self, state, cleaned_text):
+        '''変わった形態素が関わる組み合わせの結合語だけを作り直す
+
+        編集前後の形態素の並びを比べ、変わっていない形態素同士の組み合わせは
+        編集前の結果をそのまま使う。
+        '''
+        old_keys, old_parts, counter = state
+        features = remove_noise_words(self._get_features(cleaned_text))
+        keys = list(map(token_key, features))
+
+        matcher = SequenceMatcher(None, old_keys, keys, autojunk=False)
+        # 新しい位置 -> 編集前の位置（変わっていない形態素のみ）
+        kept = {}
+        for old_start, new_start, size in matcher.get_matching_blocks():
+            for offset in range(size):
+                kept[new_start + offset] = old_start + offset
+        old_kept = set(kept.values())
+
+        removed = []
+        for i in range(len(old_parts)):
+            for j in range(i + 1, len(old_parts)):
+                if i not in old_kept or j not in old_kept:
+                    removed.extend(self._reflex(old_parts[i], old_parts[j]))
+        counter = counter.copy()
+        counter.subtract(removed)
+        parts = []
+        for i, feature in enumerate(features):
+            if i in kept:
+                parts.append(old_parts[kept[i]])
+            else:
+                parts.append(self._make_acronym_parts([feature])[0])
+        added = []
+        for i in range(len(parts)):
+            for j in range(i + 1, len(parts)):
+                if i not in kept or j not in kept:
+                    added.extend(self._reflex(parts[i], parts[j]))
+        counter.update(added)
+        # 作られた回数が0になった結合語を取り除く
+        counter = +counter
+        return keys, parts, counter
+
+    def _regenerate_combination_words(self, old_cleaned_text, cleaned_text):
+        '''編集前の結合語を元に、編集後の結合語を CandidateSet で作る
+
+        generate() で数えておいた結合語の回数があれば、それを元に差分だけを数える。
+        '''
+        if self.max_candidates is not None:
+            return self._collect_combination_words(self._get_features(cleaned_text))
+        state = self._combination_state
+        old_features = remove_noise_words(self._get_features(old_cleaned_text))
+        if state is None or state[0] != list(map(token_key, old_features)):
+            state = self._count_combination_words(old_cleaned_text)
+        if cleaned_text != old_cleaned_text:
+            state = self._update_combination_words(state, cleaned_text)
+        self._combination_state = state
+        return self._combination_candidates(state[1], state[2])
+
+    def iter_ranked_combination_words(self, features_list: list):
+        '''結合語のゆらぎ候補語を、スコアの高い順に1つずつ返す
+
+        単語の組み合わせごとに combination_score でスコアをつけ、
+        ヒープからスコアの高い組み合わせを取り出しては、その結合語を返す。
+        結合語は取り出された組み合わせの分しか作らないので、
+        必要な件数を取り出したところで止めれば、総当たりの結合語は作られない。
+        重複する候補語は返さない。
+        '''
+        for _, word in self._iter_ranked_combination_pairs(features_list):
+            yield word
+
+    def _iter_ranked_combination_pairs(self, features_list: list):
+        '''iter_ranked_combination_words と同じ順番で、
+        ((単語Aの位置, 単語Bの位置), 結合語) を1つずつ返す
+        '''
+        features = remove_noise_words(features_list)
+        if self.metrics is not None:
+            self.metrics.observe('yuragi_tokens_after_noise_removal', len(features))
+        score = self.combination_score or score_combination
+
+        # heapq は最小値から取り出すので、スコアを負にして積む
+        heap = []
+        for i, feature_a in enumerate(features):
+            for j in range(i + 1, len(features)):
+                heap.append((-score(feature_a, i, features[j], j), i, j))
+        heapq.heapify(heap)
+
+        parts = {}
+        seen = set()
+        while heap:
+            _, i, j = heapq.heappop(heap)
+            for index in (i, j):
+                if index not in parts:
+                    parts[index] = self._make_acronym_parts([features[index]])[0]
+            for word in self._reflex(parts[i], parts[j]):
+                if word not in seen:
+                    seen.add(word)
+                    yield (i, j), word
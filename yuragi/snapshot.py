@@ -0,0 +1,119 @@
+'''読み込み時に作る表のスナップショット
+
+ローマ字の逆引き表、文字種の表、まとめた除去ルールは、普段はモジュールの読み込み時や
+初めて使われたときに作る。スナップショットを作っておき、環境変数 YURAGI_SNAPSHOT に
+パスを指定すると、これらの表を1回のファイル読み込みで復元する。
+起動回数の多いCLIのワーカーやサーバーレスの関数向け。
+例：
+    $ python yuragi/snapshot.py tables.snapshot
+    $ YURAGI_SNAPSHOT=tables.snapshot python -m yuragi titles.txt
+
+スナップショットは marshal 形式で保存する（pickle と違って読み込みに import が要らない）。
+marshal の形式はPythonのバージョンごとに異なるので、作ったときのバージョンも記録する。
+また表を作ったソースファイルのサイズと更新日時を記録しておき、
+ソースが変わっていた場合やファイルが読めない場合は使わずに、いつも通り表を作る。
+'''
+import marshal
+import os
+import sys
+
+# スナップショットのフォーマットのバージョン
+# 保存する表を変えたときは上げること
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ENV = 'YURAGI_SNAPSHOT'
+
+# 表を作っているソースファイル
+SOURCE_FILES = ('utils.py', 'charclass.py', 'remove.py')
+
+_MISSING = object()
+_tables = _MISSING
+
+
+def source_fingerprint():
+    '''表を作っているソースファイルの (名前, サイズ, 更新日時) のリストを返す
+    '''
+    directory = os.path.dirname(os.path.abspath(__file__))
+    fingerprint = []
+    for name in SOURCE_FILES:
+        stat = os.stat(os.path.join(directory, name))
+        fingerprint.append((name, stat.st_size, stat.st_mtime_ns))
+    return fingerprint
+
+
+def load_snapshot(path):
+    '''スナップショットを読み込んで、表のdictを返す
+
+    使えないスナップショットの場合は None を返す。
+    '''
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        snapshot = marshal.loads(data)
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    if (not isinstance(snapshot, dict) or
+            snapshot.get('version') != SNAPSHOT_VERSION or
+            snapshot.get('python') != sys.version_info[:2] or
+            snapshot.get('sources') != source_fingerprint()):
+        return None
+    return snapshot['tables']
+
+
+def get_tables():
+    '''環境変数で指定されたスナップショットの表を返す
+
+    指定されていない場合や使えない場合は None を返す。読み込みはプロセスで1回だけ。
+    '''
+    global _tables
+    if _tables is _MISSING:
+        path = os.environ.get(SNAPSHOT_ENV)
+        _tables = load_snapshot(path) if path else None
+    return _tables
+
+
+def get_table(name):
+    tables = get_tables()
+    if tables is None:
+        return None
+    return tables.get(name)
+
+
+def build_tables():
+    '''スナップショットに保存する表を、ソースから作り直す
+    '''
+    import charclass
+    import remove
+    import utils
+
+    kana_romaji = utils.build_kana_romaji(utils.ROMAJI_MASTER)
+    return {
+        'kana_romaji': kana_romaji,
+        'script_table': charclass.build_script_table(),
+        'cleaning_stages': remove.TextCleaner(remove.CLEANING_RULES).dump_stages(),
+    }
+
+
+def save_snapshot(path):
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'python': sys.version_info[:2],
+        'sources': source_fingerprint(),
+        'tables': build_tables(),
+    }
+    # 書き込み途中のファイルを読まれないように、別名で書いてから置き換える
+    temp_path = '{0}.tmp{1}'.format(path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        f.write(marshal.dumps(snapshot))
+    os.replace(temp_path, path)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='読み込み時に作る表のスナップショットを作成する')
+    parser.add_argument('path', help='スナップショットを書き出すファイル')
+    args = parser.parse_args(argv)
+    save_snapshot(args.path)
+
+
+if __name__ == '__main__':
+    main()
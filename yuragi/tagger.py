@@ -0,0 +1,121 @@
+import threading
+
+from lazy import lazy_import
+from morpheme import Morpheme
+from settings import NEOLOGD_PATH
+
+# 初めて辞書を読み込むときに import する
+MeCab = lazy_import('MeCab')
+
+
+def get_tagger_options(use_neologd=False):
+    '''MeCabに渡すオプション文字列を返す
+
+    辞書ごとにオプション文字列が異なるので、これをTaggerの管理キーとして使う。
+    '''
+    if use_neologd:
+        return ' --dicdir {0}'.format(NEOLOGD_PATH)
+    return ''
+
+
+class TaggerManager:
+    '''MeCab.Taggerをオプション（辞書）ごとに使い回すための管理クラス
+
+    辞書の読み込みは MeCab.Model が担当し、オプションごとにプロセスで1回だけ行う。
+    MeCab.Tagger はスレッドセーフではないので、Modelからスレッドごとに作成する。
+    Model・Taggerはどちらも初めて使われたときに作成する。
+
+    常駐するサービスでは、起動時に warm_up() を呼んでおけば
+    リクエストの処理中に辞書の読み込みが発生しない。
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._models = {}
+        # close() されるたびに増える。スレッドごとのTaggerを破棄するのに使う
+        self._generation = 0
+
+    def _get_model(self, options):
+        model = self._models.get(options)
+        if model is None:
+            with self._lock:
+                model = self._models.get(options)
+                if model is None:
+                    model = MeCab.Model(options)
+                    self._models[options] = model
+        return model
+
+    def get_tagger(self, options=''):
+        '''現在のスレッド用のTaggerを返す
+        '''
+        local = self._local
+        if getattr(local, 'generation', None) != self._generation:
+            local.taggers = {}
+            local.generation = self._generation
+        tagger = local.taggers.get(options)
+        if tagger is None:
+            tagger = self._get_model(options).createTagger()
+            # 古いmecab-pythonでは、一度 parse() してから parseToNode() を使わないと
+            # node.surface が壊れることがあるので、作成時に空文字列を解析しておく
+            tagger.parse('')
+            local.taggers[options] = tagger
+        return tagger
+
+    def warm_up(self, options_list=None):
+        '''辞書を先に読み込んでおく
+
+        options_list を省略した場合は、デフォルト辞書とNEOLOGDの両方を読み込む。
+        '''
+        if options_list is None:
+            options_list = [get_tagger_options(use_neologd=False),
+                            get_tagger_options(use_neologd=True)]
+        for options in options_list:
+            self.get_tagger(options)
+
+    def close(self):
+        '''読み込んだ辞書とTaggerを破棄する
+
+        他のスレッドが持っているTaggerは、そのスレッドが次に get_tagger() を
+        呼んだときに破棄される。
+        '''
+        with self._lock:
+            self._models = {}
+            self._generation += 1
+        self._local.taggers = {}
+        self._local.generation = self._generation
+
+
+# プロセス全体で共有するTaggerManager
+tagger_manager = TaggerManager()
+
+
+def get_tagger(use_neologd=False):
+    return tagger_manager.get_tagger(get_tagger_options(use_neologd))
+
+
+def parse_features(text, use_neologd=False):
+    ''' MeCabで解析して素性（Morphemeのリスト）を取得する
+
+    parseToNode で形態素を1つずつ受け取り、出力全体を文字列で分割せずに Morpheme にする。
+    '''
+    # Taggerは辞書ごとに使い回す（辞書の読み込みは1プロセス1回だけ）
+    tagger = get_tagger(use_neologd=use_neologd)
+    bos_node = MeCab.MECAB_BOS_NODE
+    eos_node = MeCab.MECAB_EOS_NODE
+    features = []
+    node = tagger.parseToNode(text)
+    while node:
+        # BOS/EOSは何もしない
+        if node.stat != bos_node and node.stat != eos_node:
+            features.append(Morpheme.from_feature(node.surface, node.feature))
+        node = node.next
+    return features
+
+
+def warm_up():
+    tagger_manager.warm_up()
+
+
+def close():
+    tagger_manager.close()
@@ -1,5 +1,7 @@
 from shortened_word import SingleShortenedWord, CombinedShortenedWord
 from yuragi import Yuragi
+from utils import kana2romaji
+from remove import remove_series
 
 import pprint
 pp = pprint.PrettyPrinter(indent=4)
@@ -42,6 +44,81 @@ def test_yuragi(text, target_word):
     test_common(text, target_word, yuragi_word)
 
 
+def test_parity(description, expected, actual):
+    '''同じ結果になるはずの2つの処理を比べるテスト
+    '''
+    print('{}:'.format(description))
+    if expected == actual:
+        print('OK')
+    else:
+        print("!!!FAILED!!!")
+        print('期待値:{}'.format(expected))
+        print('実際値:{}'.format(actual))
+    print('\n')
+
+
+def test_generate_many(titles, **kwargs):
+    '''generate_many() が1件ずつ generate() したのと同じ結果を返すかのテスト
+
+    チャンクをまたぐように chunk_size=2 で実行する。
+    チャンク内の形態素を列に集めて作った結合語（bulk.TokenColumns）も、
+    1件ずつ作ったものと順番まで同じになる。
+    '''
+    expected = [(title, Yuragi(title, **kwargs).generate()) for title in titles]
+    actual = list(Yuragi.generate_many(titles, chunk_size=2, **kwargs))
+    test_parity('generate_many() と1件ずつの generate() {}'.format(kwargs),
+                expected, actual)
+
+
+def test_regenerate(text, new_text):
+    '''regenerate() が、編集後の文字列で generate() したのと同じ結果になるかのテスト
+
+    候補語の順番と、結合語の出自（組み合わせた形態素の位置）まで比べる。
+    '''
+    yuragi_word = Yuragi(text)
+    yuragi_word.generate()
+    yuragi_word.regenerate(new_text)
+    fresh = Yuragi(new_text)
+    fresh.generate()
+    test_parity('「{}」を「{}」に regenerate() したものと generate()'.format(text, new_text),
+                (fresh.words, list(fresh.candidates.entries())),
+                (yuragi_word.words, list(yuragi_word.candidates.entries())))
+
+
+def test_iter_words(text):
+    '''iter_words() が generate() と同じ候補語を、重複なく返すかのテスト
+    '''
+    yuragi_word = Yuragi(text)
+    yuragi_word.generate()
+    words = list(Yuragi(text).iter_words())
+    test_parity('「{}」の iter_words() と generate()'.format(text),
+                (sorted(yuragi_word.get_words()), len(words)),
+                (sorted(words), len(set(words))))
+
+
+def test_kana2romaji(kana, expected):
+    '''カナのローマ字変換のテスト
+
+    拗音は最長一致で、促音（ッ）は次の子音を重ねて、長音（ー）は前の母音を重ねて変換する。
+    '''
+    test_parity('「{}」のローマ字'.format(kana), expected, kana2romaji(kana))
+
+
+def test_remove_series(text, expected, same_as):
+    '''シリーズ番号の除去のテスト
+
+    シリーズを示す語が続いていても、全て取り除く。
+    除去後が同じになるタイトル same_as と、divided 以外のゆらぎ候補語も同じになる。
+    '''
+    test_parity('「{}」のシリーズ番号の除去'.format(text),
+                expected, remove_series(text))
+    words = Yuragi(text).generate()
+    same_words = Yuragi(same_as).generate()
+    del words['divided'], same_words['divided']
+    test_parity('「{}」と「{}」のゆらぎ候補語'.format(text, same_as),
+                same_words, words)
+
+
 def main():
     # # -------------------------------
     # # 単一語のテスト
@@ -95,5 +172,37 @@ def main():
     test_yuragi('Re：ゼロから始める異世界生活', 'リゼロ')
     test_yuragi('転生したらスライムだった件', '転スラ')
 
+    # -------------------------------
+    # 処理の経路によらず同じ結果になるかのテスト
+    # -------------------------------
+    titles = [
+        'ダンジョンに出会いを求めるのは間違っているだろうか',
+        'Re：ゼロから始める異世界生活',
+        '転生したらスライムだった件',
+        '真夜中のプリンス',
+        '転生したらスライムだった件',
+        ' CRISIS 公安機動捜査隊特捜班 ',
+        'CRISIS 公安機動捜査隊特捜班',
+    ]
+    test_generate_many(titles)
+    test_generate_many(titles, max_candidates=10)
+    test_regenerate('転生したらスライムだった件', '転生したらスライムだった件 第2期')
+    test_regenerate('真夜中のプリンス', '真夜中のプリンスと探偵')
+    test_regenerate('真夜中のプリンス', '探偵と真夜中のプリンス')
+    test_regenerate('鋼の錬金術師', '鋼の錬金術師')
+    test_iter_words('ダンジョンに出会いを求めるのは間違っているだろうか')
+    test_iter_words('Re：ゼロから始める異世界生活')
+
+    # -------------------------------
+    # 変換のテスト
+    # -------------------------------
+    test_kana2romaji('テンスラ', 'tensura')
+    test_kana2romaji('キャッチャー', 'kyacchaa')
+    test_kana2romaji('ロッテ', 'rotte')
+    test_kana2romaji('シャッフル', 'shaffuru')
+    test_remove_series('season Season 転生', '転生', '転生')
+    test_remove_series('シリーズ シーズン 探偵', '探偵', '探偵')
+    test_remove_series('警視庁捜査一課9係　season12', '警視庁捜査一課9係', '警視庁捜査一課9係')
+
 
 main()
@@ -1,94 +1,160 @@
-import re, mojimoji
+from charclass import (
+    KATAKANA,
+    KANJI,
+    DIGIT,
+    ZENKAKU_DIGIT,
+    classify_letters,
+    script_of
+)
+from lazy import lazy_import
+from snapshot import get_table
+
+mojimoji = lazy_import('mojimoji')
 
 
 def is_katakana(letter):
-    if re.match('[ァ-ンー]', letter):
-        return True
-    else:
-        return False
+    return bool(letter) and classify_letters(letter[0]) == KATAKANA
 
 
 def is_kanji(letter):
-    if re.match('[一-龥]', letter):
-        return True
-    else:
-        return False
+    return bool(letter) and classify_letters(letter[0]) == KANJI
 
 
 def is_num(letter):
-    if re.match('^[0-9]+$', letter):
-        return True
-    else:
-        return False
+    return script_of(letter) == DIGIT
 
 
 def is_num_zenkaku(letter):
-    if re.match('^[０-９]+$', letter):
-        return True
-    else:
-        return False
+    return script_of(letter) == ZENKAKU_DIGIT
+
 
 def convert_num_han2zen(letter):
     return mojimoji.han_to_zen(letter)
 
 
+# masterの設定はこの記事から拝借した
+# http://d.hatena.ne.jp/mohayonao/20091129/1259505966
+ROMAJI_MASTER = {
+    'a'  :'ア', 'i'  :'イ', 'u'  :'ウ', 'e'  :'エ', 'o'  :'オ',
+    'ka' :'カ', 'ki' :'キ', 'ku' :'ク', 'ke' :'ケ', 'ko' :'コ',
+    'sa' :'サ', 'shi':'シ', 'su' :'ス', 'se' :'セ', 'so' :'ソ',
+    'ta' :'タ', 'chi':'チ', 'tu' :'ツ', 'te' :'テ', 'to' :'ト',
+    'na' :'ナ', 'ni' :'ニ', 'nu' :'ヌ', 'ne' :'ネ', 'no' :'ノ',
+    'ha' :'ハ', 'hi' :'ヒ', 'fu' :'フ', 'he' :'ヘ', 'ho' :'ホ',
+    'ma' :'マ', 'mi' :'ミ', 'mu' :'ム', 'me' :'メ', 'mo' :'モ',
+    'ya' :'ヤ', 'yu' :'ユ', 'yo' :'ヨ',
+    'ra' :'ラ', 'ri' :'リ', 'ru' :'ル', 're' :'レ', 'ro' :'ロ',
+    'wa' :'ワ', 'wo' :'ヲ', 'n'  :'ン', 'vu' :'ヴ',
+    'ga' :'ガ', 'gi' :'ギ', 'gu' :'グ', 'ge' :'ゲ', 'go' :'ゴ',
+    'za' :'ザ', 'ji' :'ジ', 'zu' :'ズ', 'ze' :'ゼ', 'zo' :'ゾ',
+    'da' :'ダ', 'di' :'ヂ', 'du' :'ヅ', 'de' :'デ', 'do' :'ド',
+    'ba' :'バ', 'bi' :'ビ', 'bu' :'ブ', 'be' :'ベ', 'bo' :'ボ',
+    'pa' :'パ', 'pi' :'ピ', 'pu' :'プ', 'pe' :'ペ', 'po' :'ポ',
+    
+    'kya':'キャ', 'kyi':'キィ', 'kyu':'キュ', 'kye':'キェ', 'kyo':'キョ',
+    'gya':'ギャ', 'gyi':'ギィ', 'gyu':'ギュ', 'gye':'ギェ', 'gyo':'ギョ',
+    'sha':'シャ',               'shu':'シュ', 'she':'シェ', 'sho':'ショ',
+    'ja' :'ジャ',               'ju' :'ジュ', 'je' :'ジェ', 'jo' :'ジョ',
+    'cha':'チャ',               'chu':'チュ', 'che':'チェ', 'cho':'チョ',
+    'dya':'ヂャ', 'dyi':'ヂィ', 'dyu':'ヂュ', 'dhe':'デェ', 'dyo':'ヂョ',
+    'nya':'ニャ', 'nyi':'ニィ', 'nyu':'ニュ', 'nye':'ニェ', 'nyo':'ニョ',
+    'hya':'ヒャ', 'hyi':'ヒィ', 'hyu':'ヒュ', 'hye':'ヒェ', 'hyo':'ヒョ',
+    'bya':'ビャ', 'byi':'ビィ', 'byu':'ビュ', 'bye':'ビェ', 'byo':'ビョ',
+    'pya':'ピャ', 'pyi':'ピィ', 'pyu':'ピュ', 'pye':'ピェ', 'pyo':'ピョ',
+    'mya':'ミャ', 'myi':'ミィ', 'myu':'ミュ', 'mye':'ミェ', 'myo':'ミョ',
+    'rya':'リャ', 'ryi':'リィ', 'ryu':'リュ', 'rye':'リェ', 'ryo':'リョ',
+    'fa' :'ファ', 'fi' :'フィ',               'fe' :'フェ', 'fo' :'フォ',
+    'wi' :'ウィ', 'we' :'ウェ', 
+    'va' :'ヴァ', 'vi' :'ヴィ', 've' :'ヴェ', 'vo' :'ヴォ',
+    
+    'kwa':'クァ', 'kwi':'クィ', 'kwu':'クゥ', 'kwe':'クェ', 'kwo':'クォ',
+    'kha':'クァ', 'khi':'クィ', 'khu':'クゥ', 'khe':'クェ', 'kho':'クォ',
+    'gwa':'グァ', 'gwi':'グィ', 'gwu':'グゥ', 'gwe':'グェ', 'gwo':'グォ',
+    'gha':'グァ', 'ghi':'グィ', 'ghu':'グゥ', 'ghe':'グェ', 'gho':'グォ',
+    'swa':'スァ', 'swi':'スィ', 'swu':'スゥ', 'swe':'スェ', 'swo':'スォ',
+    'swa':'スァ', 'swi':'スィ', 'swu':'スゥ', 'swe':'スェ', 'swo':'スォ',
+    'zwa':'ズヮ', 'zwi':'ズィ', 'zwu':'ズゥ', 'zwe':'ズェ', 'zwo':'ズォ',
+    'twa':'トァ', 'twi':'トィ', 'twu':'トゥ', 'twe':'トェ', 'two':'トォ',
+    'dwa':'ドァ', 'dwi':'ドィ', 'dwu':'ドゥ', 'dwe':'ドェ', 'dwo':'ドォ',
+    'mwa':'ムヮ', 'mwi':'ムィ', 'mwu':'ムゥ', 'mwe':'ムェ', 'mwo':'ムォ',
+    'bwa':'ビヮ', 'bwi':'ビィ', 'bwu':'ビゥ', 'bwe':'ビェ', 'bwo':'ビォ',
+    'pwa':'プヮ', 'pwi':'プィ', 'pwu':'プゥ', 'pwe':'プェ', 'pwo':'プォ',
+    'phi':'プィ', 'phu':'プゥ', 'phe':'プェ', 'pho':'フォ',
+}
+
+
+def build_kana_romaji(master):
+    '''カタカナ -> ローマ字の逆引き表を作る
+
+    同じカタカナに複数のローマ字がある場合（クァ: kwa, kha など）は先に書かれた方を使う。
+    '''
+    kana_romaji = {}
+    for romaji, kana in master.items():
+        kana_romaji.setdefault(kana, romaji)
+    return kana_romaji
+
+
+# カタカナ -> ローマ字の逆引き表。読み込み時に一度だけ作る（スナップショットがあればそれを使う）
+KANA_ROMAJI = get_table('kana_romaji') or build_kana_romaji(ROMAJI_MASTER)
+# 逆引き表のカタカナの最大文字数（キャ、ファなどは2字）
+KANA_MAX_LENGTH = max(len(kana) for kana in KANA_ROMAJI)
+
+# ひらがなをカタカナに変換する表（ぁ-ゖ -> ァ-ヶ）
+HIRA2KATA_TABLE = {code: code + 0x60 for code in range(ord('ぁ'), ord('ゖ') + 1)}
+
+
 def kana2romaji(letters):
+    '''カタカナ（ひらがな）をローマ字に変換する
+
+    先頭から、逆引き表に一致する最も長いカタカナを探して変換する。
+    - 「ッ」は次の音の子音を重ねる（例：ロッテ -> rotte）
+    - 「ー」は直前の母音を重ねる（例：スーパー -> suupaa）
+    逆引き表にない文字は無視する。
+    '''
     if letters is None:
         return ''
-    # masterの設定はこの記事から拝借した
-    # http://d.hatena.ne.jp/mohayonao/20091129/1259505966
-    # 「ッ」「ー」とかは取れていないので、必要に応じてあとで実装する。
-    master = {
-        'a'  :'ア', 'i'  :'イ', 'u'  :'ウ', 'e'  :'エ', 'o'  :'オ',
-        'ka' :'カ', 'ki' :'キ', 'ku' :'ク', 'ke' :'ケ', 'ko' :'コ',
-        'sa' :'サ', 'shi':'シ', 'su' :'ス', 'se' :'セ', 'so' :'ソ',
-        'ta' :'タ', 'chi':'チ', 'tu' :'ツ', 'te' :'テ', 'to' :'ト',
-        'na' :'ナ', 'ni' :'ニ', 'nu' :'ヌ', 'ne' :'ネ', 'no' :'ノ',
-        'ha' :'ハ', 'hi' :'ヒ', 'fu' :'フ', 'he' :'ヘ', 'ho' :'ホ',
-        'ma' :'マ', 'mi' :'ミ', 'mu' :'ム', 'me' :'メ', 'mo' :'モ',
-        'ya' :'ヤ', 'yu' :'ユ', 'yo' :'ヨ',
-        'ra' :'ラ', 'ri' :'リ', 'ru' :'ル', 're' :'レ', 'ro' :'ロ',
-        'wa' :'ワ', 'wo' :'ヲ', 'n'  :'ン', 'vu' :'ヴ',
-        'ga' :'ガ', 'gi' :'ギ', 'gu' :'グ', 'ge' :'ゲ', 'go' :'ゴ',
-        'za' :'ザ', 'ji' :'ジ', 'zu' :'ズ', 'ze' :'ゼ', 'zo' :'ゾ',
-        'da' :'ダ', 'di' :'ヂ', 'du' :'ヅ', 'de' :'デ', 'do' :'ド',
-        'ba' :'バ', 'bi' :'ビ', 'bu' :'ブ', 'be' :'ベ', 'bo' :'ボ',
-        'pa' :'パ', 'pi' :'ピ', 'pu' :'プ', 'pe' :'ペ', 'po' :'ポ',
-        
-        'kya':'キャ', 'kyi':'キィ', 'kyu':'キュ', 'kye':'キェ', 'kyo':'キョ',
-        'gya':'ギャ', 'gyi':'ギィ', 'gyu':'ギュ', 'gye':'ギェ', 'gyo':'ギョ',
-        'sha':'シャ',               'shu':'シュ', 'she':'シェ', 'sho':'ショ',
-        'ja' :'ジャ',               'ju' :'ジュ', 'je' :'ジェ', 'jo' :'ジョ',
-        'cha':'チャ',               'chu':'チュ', 'che':'チェ', 'cho':'チョ',
-        'dya':'ヂャ', 'dyi':'ヂィ', 'dyu':'ヂュ', 'dhe':'デェ', 'dyo':'ヂョ',
-        'nya':'ニャ', 'nyi':'ニィ', 'nyu':'ニュ', 'nye':'ニェ', 'nyo':'ニョ',
-        'hya':'ヒャ', 'hyi':'ヒィ', 'hyu':'ヒュ', 'hye':'ヒェ', 'hyo':'ヒョ',
-        'bya':'ビャ', 'byi':'ビィ', 'byu':'ビュ', 'bye':'ビェ', 'byo':'ビョ',
-        'pya':'ピャ', 'pyi':'ピィ', 'pyu':'ピュ', 'pye':'ピェ', 'pyo':'ピョ',
-        'mya':'ミャ', 'myi':'ミィ', 'myu':'ミュ', 'mye':'ミェ', 'myo':'ミョ',
-        'rya':'リャ', 'ryi':'リィ', 'ryu':'リュ', 'rye':'リェ', 'ryo':'リョ',
-        'fa' :'ファ', 'fi' :'フィ',               'fe' :'フェ', 'fo' :'フォ',
-        'wi' :'ウィ', 'we' :'ウェ', 
-        'va' :'ヴァ', 'vi' :'ヴィ', 've' :'ヴェ', 'vo' :'ヴォ',
-        
-        'kwa':'クァ', 'kwi':'クィ', 'kwu':'クゥ', 'kwe':'クェ', 'kwo':'クォ',
-        'kha':'クァ', 'khi':'クィ', 'khu':'クゥ', 'khe':'クェ', 'kho':'クォ',
-        'gwa':'グァ', 'gwi':'グィ', 'gwu':'グゥ', 'gwe':'グェ', 'gwo':'グォ',
-        'gha':'グァ', 'ghi':'グィ', 'ghu':'グゥ', 'ghe':'グェ', 'gho':'グォ',
-        'swa':'スァ', 'swi':'スィ', 'swu':'スゥ', 'swe':'スェ', 'swo':'スォ',
-        'swa':'スァ', 'swi':'スィ', 'swu':'スゥ', 'swe':'スェ', 'swo':'スォ',
-        'zwa':'ズヮ', 'zwi':'ズィ', 'zwu':'ズゥ', 'zwe':'ズェ', 'zwo':'ズォ',
-        'twa':'トァ', 'twi':'トィ', 'twu':'トゥ', 'twe':'トェ', 'two':'トォ',
-        'dwa':'ドァ', 'dwi':'ドィ', 'dwu':'ドゥ', 'dwe':'ドェ', 'dwo':'ドォ',
-        'mwa':'ムヮ', 'mwi':'ムィ', 'mwu':'ムゥ', 'mwe':'ムェ', 'mwo':'ムォ',
-        'bwa':'ビヮ', 'bwi':'ビィ', 'bwu':'ビゥ', 'bwe':'ビェ', 'bwo':'ビォ',
-        'pwa':'プヮ', 'pwi':'プィ', 'pwu':'プゥ', 'pwe':'プェ', 'pwo':'プォ',
-        'phi':'プィ', 'phu':'プゥ', 'phe':'プェ', 'pho':'フォ',
-    }
-    result = ''
-    for letter in letters:
-        for romaji, kana in master.items():
-            if kana == letter:
-                result += romaji
-    return result
+    letters = letters.translate(HIRA2KATA_TABLE)
+    result = []
+    sokuon = False
+    index = 0
+    length = len(letters)
+    while index < length:
+        letter = letters[index]
+        if letter == 'ッ':
+            sokuon = True
+            index += 1
+            continue
+        if letter == 'ー':
+            if result and result[-1][-1] in 'aiueo':
+                result.append(result[-1][-1])
+            index += 1
+            continue
+        for size in range(min(KANA_MAX_LENGTH, length - index), 0, -1):
+            romaji = KANA_ROMAJI.get(letters[index:index + size])
+            if romaji is not None:
+                break
+        else:
+            sokuon = False
+            index += 1
+            continue
+        if sokuon and romaji[0] not in 'aiueon':
+            romaji = romaji[0] + romaji
+        sokuon = False
+        result.append(romaji)
+        index += size
+    return ''.join(result)
 
+
+def kana2romaji_many(letters_list):
+    '''複数の文字列をまとめてローマ字に変換し、リストで返す
+
+    同じ文字列は一度だけ変換する。
+    '''
+    converted = {}
+    result = []
+    for letters in letters_list:
+        romaji = converted.get(letters)
+        if romaji is None:
+            romaji = converted[letters] = kana2romaji(letters)
+        result.append(romaji)
+    return result
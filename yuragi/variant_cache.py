@@ -0,0 +1,108 @@
+'''形態素ごとの変換結果の、プロセス全体で共有するLRUキャッシュ
+
+カタログ内のタイトルには「探偵」「警視庁」「異世界」「プリンス」のように
+同じ形態素が何度も出てくる。結合語の素（表層形、読みの先頭、ひらがな）と
+文字種の判定は形態素ごとに決まるので、一度作ったものを使い回す。
+キーは (表層形, 読み, 品詞)。読みは結合語の素に使う発音（Morpheme.pronunciation）。
+'''
+import threading
+from collections import OrderedDict
+
+from charclass import script_of
+from lazy import lazy_import
+
+jaconv = lazy_import('jaconv')
+
+
+def make_token_parts(surface, pronunciation):
+    '''1つの形態素の短縮語の素を、表層形2字、表層形1字、カタカナ2字、ひらがな2字で返す
+    '''
+    kana = pronunciation[:2]
+    return (surface[:2], surface[:1], kana, jaconv.kata2hira(kana))
+
+
+class TokenVariants:
+    '''1つの形態素の変換結果
+
+    - parts: 短縮語の素（make_token_parts の戻り値）
+    - script: 表層形の文字種（charclass.script_of の戻り値）
+    parts は初めて使われたときに作る。文字種だけを使うパターン（unique_katakana）
+    では jaconv を読み込まない。
+    '''
+    __slots__ = ('surface', 'pronunciation', '_parts', 'script')
+
+    def __init__(self, surface, pronunciation, script):
+        self.surface = surface
+        self.pronunciation = pronunciation
+        self._parts = None
+        self.script = script
+
+    @property
+    def parts(self):
+        parts = self._parts
+        if parts is None:
+            parts = self._parts = make_token_parts(self.surface, self.pronunciation)
+        return parts
+
+    @classmethod
+    def from_morpheme(cls, morpheme):
+        return cls(morpheme.surface, morpheme.pronunciation,
+                   script_of(morpheme.surface))
+
+
+class VariantCache:
+    '''形態素ごとの TokenVariants のLRUキャッシュ
+
+    複数のインスタンス・スレッドで共有できる。ヒットした場合はロックを取らずに返し、
+    追加と削除だけをロックで保護している。
+    stats() でヒット・ミスの回数が分かる（複数スレッドで使う場合はおおよその値）。
+    '''
+
+    def __init__(self, maxsize=65536):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, morpheme):
+        '''形態素の TokenVariants を返す。無ければ作ってキャッシュする
+        '''
+        key = (morpheme.surface, morpheme.pronunciation, morpheme.pos)
+        data = self._data
+        variants = data.get(key)
+        if variants is not None:
+            try:
+                data.move_to_end(key)
+            except KeyError:
+                # 他のスレッドに追い出された
+                pass
+            self.hits += 1
+            return variants
+        self.misses += 1
+        variants = TokenVariants.from_morpheme(morpheme)
+        with self._lock:
+            self._data[key] = variants
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return variants
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'size': len(self._data), 'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+# プロセス全体で共有するVariantCache
+variant_cache = VariantCache()
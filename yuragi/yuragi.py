@@ -1,20 +1,156 @@
+import time
+from itertools import islice
+
 from shortened_word import SingleShortenedWord, CombinedShortenedWord
+from feature_cache import FeatureCache, prefetch_features
+from bulk import TokenColumns
+from remove import remove_noise_words
+from candidates import CandidateSet
 
 
 class Yuragi(SingleShortenedWord, CombinedShortenedWord):
-    def generate(self):
-        words = {}
+    default_patterns = ('divided', 'unique_katakana', 'combined')
+    supported_patterns = SingleShortenedWord.supported_patterns + \
+        CombinedShortenedWord.supported_patterns
+
+    def generate(self, patterns=None):
+        # candidate_cache は default_patterns の結果だけを保存する
+        variant = self._cache_variant()
+        use_cache = self.candidate_cache is not None and variant is not None and \
+            (patterns is None or tuple(patterns) == self.default_patterns)
+        if use_cache:
+            words = self.candidate_cache.get(self.text, variant)
+            if words is not None:
+                self.words = words
+                return self.words
+
+        words = super().generate(patterns)
+
+        if use_cache:
+            self.candidate_cache.set(self.text, words, variant)
+        return self.words
 
-        # サブタイトルとシリーズ番号を除去
-        cleaned_text = self._clean_text(self.text)
+    def regenerate(self, text):
+        '''文字列が編集されたときに、変わった部分だけゆらぎ候補語を作り直す
 
-        # wordsに追加する
-        words['divided'] = self._make_divided_titles(self.text)
-        words['unique_katakana'] = self._make_unique_katakana(cleaned_text)
+        self.text を text に置き換え、self.words を更新する。
+        - サブタイトルやシリーズ番号の除去後が同じなら、divided 以外は作り直さない
+        - 結合語は、変わった形態素が関わる組み合わせだけを作り直す
+        作り直した結果（順番、出自を含む）は、text で generate() したものと同じ。
+        戻り値は編集前後のゆらぎ候補語の差分
+        {'added': 増えた候補語のリスト, 'removed': 無くなった候補語のリスト}
+        '''
+        old_words = self.get_words()
+        if set(self.words) != set(self.default_patterns):
+            # default_patterns で作った結果が無い場合は、全て作り直す
+            self.text = text
+            self.generate()
+            new_words = self.get_words()
+            old_set = set(old_words)
+            new_set = set(new_words)
+            return {'added': [word for word in new_words if word not in old_set],
+                    'removed': [word for word in old_words if word not in new_set]}
 
-        # 素性に分解して、結合する
-        features = self._get_features(cleaned_text)
-        words['combined'] = self._make_acronym_combination_words(features)
+        old_cleaned_text = self._clean_text(self.text)
+        cleaned_text = self._clean_text(text)
+        self.text = text
 
+        words = {}
+        counts = {}
+        candidates = CandidateSet(title=text)
+        words['divided'] = self._run_pattern(
+            'divided', self._make_divided_titles, text)
+        counts['divided'] = candidates.update(words['divided'], 'divided')
+        if cleaned_text == old_cleaned_text:
+            words['unique_katakana'] = self.words['unique_katakana']
+        else:
+            words['unique_katakana'] = self._run_pattern(
+                'unique_katakana', self._make_unique_katakana, cleaned_text)
+        counts['unique_katakana'] = candidates.update(
+            words['unique_katakana'], 'unique_katakana')
+        # 除去後が同じなら、数えておいた結合語の回数をそのまま使う
+        combined = self._run_pattern(
+            'combined', self._regenerate_combination_words,
+            old_cleaned_text, cleaned_text)
+        candidates.merge(combined)
+        words['combined'] = combined.words()
+        counts['combined'] = len(combined)
         self.words = words
-        return self.words
+        # 結合語の出自（組み合わせた形態素の位置）も generate() と同じように持つ
+        self._candidates = candidates
+        self._observe_candidates(candidates, counts)
+        variant = self._cache_variant()
+        if self.candidate_cache is not None and variant is not None:
+            self.candidate_cache.set(self.text, words, variant)
+
+        new_words = self.get_words()
+        old_set = set(old_words)
+        new_set = set(new_words)
+        return {'added': [word for word in new_words if word not in old_set],
+                'removed': [word for word in old_words if word not in new_set]}
+
+    @classmethod
+    def generate_many(cls, titles, chunk_size=256, feature_cache=None,
+                      candidate_cache=None, timings=False, **kwargs):
+        '''複数のタイトルからまとめてゆらぎ候補語を作成する
+
+        titles はタイトルのiterable。タイトルごとに (title, words) を yield する。
+        words は Yuragi(title).generate() の戻り値と同じ。
+        timings=True の場合は (title, words, 秒数) を yield する。秒数はそのタイトルの
+        generate() にかかった時間で、チャンクでまとめて行う解析は含まない
+        （candidate_cache から返したタイトルは 0.0）。
+        kwargs は Yuragi() にそのまま渡す。
+        chunk_size が1未満の場合は ValueError になる。
+
+        chunk_size 件ずつ、以下の段階に分けて処理する。
+        1. candidate_cache からまとめて結果を引く
+        2. キャッシュに無いタイトルから、サブタイトルとシリーズ番号を除去する
+        3. 除去後のタイトルをデフォルト辞書とNEOLOGDで解析する
+        4. チャンク内の形態素を列に集め、異なる形態素ごとに短縮語の素を作る
+        5. タイトルごとにゆらぎ候補語を作成し、candidate_cache にまとめて保存する
+        解析は辞書ごとにまとめて行い、チャンク内で重複するテキストは一度だけ解析する。
+        '''
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1: {0}'.format(chunk_size))
+        if feature_cache is None:
+            # 1タイトルあたり最大2回（デフォルト辞書、NEOLOGD）解析する
+            feature_cache = FeatureCache(maxsize=chunk_size * 2)
+        titles = iter(titles)
+        while True:
+            chunk = list(islice(titles, chunk_size))
+            if not chunk:
+                break
+            objects = [cls(title, feature_cache=feature_cache, **kwargs)
+                       for title in chunk]
+            variant = objects[0]._cache_variant()
+            use_cache = candidate_cache is not None and variant is not None
+            cached = {}
+            if use_cache:
+                cached = candidate_cache.get_many(chunk, variant)
+            missed = [obj for obj in objects if obj.text not in cached]
+            cleaned_texts = [obj._clean_text(obj.text) for obj in missed]
+            prefetch_features(cleaned_texts, feature_cache)
+            prefetch_features(cleaned_texts, feature_cache, use_neologd=True)
+            token_columns = TokenColumns()
+            for obj, cleaned_text in zip(missed, cleaned_texts):
+                obj.token_columns = token_columns
+                obj.token_index = token_columns.add_title(
+                    remove_noise_words(obj._get_features(cleaned_text)))
+            token_columns.build()
+            generated = {}
+            elapsed = {}
+            for obj in missed:
+                start = time.perf_counter()
+                generated[obj.text] = obj.generate()
+                elapsed[obj.text] = time.perf_counter() - start
+                # 列はこのチャンクの generate() でしか使わない
+                obj.token_columns = obj.token_index = None
+            if use_cache and generated:
+                candidate_cache.set_many(generated.items(), variant)
+            for obj in objects:
+                if obj.text in cached:
+                    obj.words = cached[obj.text]
+                if timings:
+                    yield obj.text, obj.words, elapsed.get(obj.text, 0.0)
+                else:
+                    yield obj.text, obj.words